@@ -0,0 +1,271 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from spino_runner import (
+    WIDTH, HEIGHT, SIM_DT, SCROLL_SPEED, GRAVITY, JUMP_V, DISTANCE_SPEED, HITBOX_SCALE,
+    SPINO_STAND_W, SPINO_STAND_H, SPINO_DUCK_W, SPINO_DUCK_H,
+    CACTUS_W, CACTUS_H, PTERA_W, PTERA_H,
+    SPAWN_FIRST_MIN, SPAWN_FIRST_MAX, SPAWN_INTERVAL_MIN, SPAWN_INTERVAL_MAX,
+    PTERA_MIN_DISTANCE, PTERA_CHANCE,
+    ACTION_NONE, ACTION_JUMP, ACTION_DUCK,
+    Cactus, Pteranodon, GameState, pteranodon_band,
+)
+from spino_rollout import policy_reflex
+
+# ---------------------------
+# N забегов сразу: состояние в массивах NumPy (структура массивов).
+# Логика шага повторяет GameState.step(decor=False) один в один; случайные
+# решения спавна берутся из того же random.Random(seed) в том же порядке,
+# поэтому при одинаковых seed и действиях результаты совпадают точно
+# ---------------------------
+PLAYER_X = 70
+MAX_OBSTACLES = 8  # на экране одновременно не больше 4 (мин. интервал 55 шагов * 7 px)
+
+KIND_W = np.array([CACTUS_W, PTERA_W])
+# хитбокс препятствия: центр по x совпадает с картинкой, низ — с низом картинки
+KIND_HIT_W = np.array([int(CACTUS_W * HITBOX_SCALE), int(PTERA_W * HITBOX_SCALE)])
+KIND_HIT_H = np.array([int(CACTUS_H * HITBOX_SCALE), int(PTERA_H * HITBOX_SCALE)])
+KIND_HIT_DX = KIND_W // 2 - KIND_HIT_W // 2
+
+
+def _player_hitbox(w, h):
+    hit_w = int(w * HITBOX_SCALE)
+    hit_h = int(h * HITBOX_SCALE)
+    return PLAYER_X + w // 2 - hit_w // 2, hit_w, hit_h
+
+STAND_HIT = _player_hitbox(SPINO_STAND_W, SPINO_STAND_H)
+DUCK_HIT = _player_hitbox(SPINO_DUCK_W, SPINO_DUCK_H)
+
+
+class BatchGameState:
+    def __init__(self, n, max_obstacles=MAX_OBSTACLES):
+        self.n = n
+        self.m = max_obstacles
+        # игрок
+        self.bottom = np.full(n, HEIGHT, dtype=np.int64)
+        self.vis_h = np.full(n, SPINO_STAND_H, dtype=np.int64)  # высота картинки игрока
+        self.vy = np.zeros(n)
+        self.on_ground = np.ones(n, dtype=bool)
+        self.ducking = np.zeros(n, dtype=bool)
+        # препятствия: [n, m], x — левый край картинки
+        self.ox = np.zeros((n, max_obstacles), dtype=np.int64)
+        self.obottom = np.zeros((n, max_obstacles), dtype=np.int64)
+        self.kind = np.zeros((n, max_obstacles), dtype=np.int64)
+        self.alive = np.zeros((n, max_obstacles), dtype=bool)
+        # забег
+        self.spawn_timer = np.zeros(n, dtype=np.int64)
+        self.next_spawn = np.zeros(n, dtype=np.int64)
+        self.distance = np.zeros(n)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.frames = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.seeds = [None] * n
+        self.rngs = [random.Random() for _ in range(n)]
+
+    def reset(self, seeds=None):
+        if seeds is None:
+            seeds = [None] * self.n
+        if len(seeds) != self.n:
+            raise ValueError(f"нужно {self.n} seed, получено {len(seeds)}")
+        self.seeds = list(seeds)
+        self.rngs = [random.Random(s) for s in self.seeds]
+        self.bottom[:] = HEIGHT
+        self.vis_h[:] = SPINO_STAND_H
+        self.vy[:] = 0.0
+        self.on_ground[:] = True
+        self.ducking[:] = False
+        self.alive[:] = False
+        self.spawn_timer[:] = 0
+        self.next_spawn[:] = [rng.randint(SPAWN_FIRST_MIN, SPAWN_FIRST_MAX) for rng in self.rngs]
+        self.distance[:] = 0.0
+        self.score[:] = 0
+        self.frames[:] = 0
+        self.done[:] = False
+        return self.observations()
+
+    def step(self, actions):
+        # actions — массив из n ACTION_*; закончившиеся забеги не двигаются
+        actions = np.asarray(actions)
+        active = ~self.done
+
+        # прыжок
+        jump = active & (actions == ACTION_JUMP) & self.on_ground
+        self.on_ground[jump] = False
+        self.ducking[jump] = False
+        self.vy[jump] = -JUMP_V
+
+        # Player.update: размер картинки, гравитация и приземление
+        self.ducking[active] = self.on_ground[active] & (actions[active] == ACTION_DUCK)
+        ground = active & self.on_ground
+        self.vis_h[ground] = np.where(self.ducking[ground], SPINO_DUCK_H, SPINO_STAND_H)
+        self.bottom[ground] = HEIGHT
+        air = active & ~self.on_ground
+        # в воздухе картинка снова «стоячая», а pygame.Rect меняет высоту при
+        # неизменном верхе — после прыжка из приседа низ уезжает вниз
+        self.bottom[air] += SPINO_STAND_H - self.vis_h[air]
+        self.vis_h[air] = SPINO_STAND_H
+        self.vy[air] += GRAVITY
+        self.bottom[air] += np.trunc(self.vy[air]).astype(np.int64)
+        landed = air & (self.bottom >= HEIGHT)
+        self.bottom[landed] = HEIGHT
+        self.vy[landed] = 0.0
+        self.on_ground[landed] = True
+
+        self.distance[active] += DISTANCE_SPEED * SIM_DT
+
+        # спавн: редкое событие, решения — из per-run random.Random
+        self.spawn_timer[active] += 1
+        for i in np.flatnonzero(active & (self.spawn_timer >= self.next_spawn)):
+            self._spawn(i)
+
+        # прокрутка и уход за левый край
+        moving = self.alive & active[:, None]
+        self.ox[moving] -= SCROLL_SPEED
+        gone = moving & (self.ox + KIND_W[self.kind] < 0)
+        passed = gone.sum(axis=1)
+        self.alive[gone] = False
+        self.score += passed
+        self.frames[active] += 1
+
+        # AABB хитбоксов (как pygame.Rect.colliderect)
+        p_left = np.where(self.ducking, DUCK_HIT[0], STAND_HIT[0])
+        p_w = np.where(self.ducking, DUCK_HIT[1], STAND_HIT[1])
+        p_h = np.where(self.ducking, DUCK_HIT[2], STAND_HIT[2])
+        p_top = self.bottom - p_h
+        o_left = self.ox + KIND_HIT_DX[self.kind]
+        o_top = self.obottom - KIND_HIT_H[self.kind]
+        hit = (self.alive
+               & (o_left < (p_left + p_w)[:, None]) & (o_left + KIND_HIT_W[self.kind] > p_left[:, None])
+               & (o_top < self.bottom[:, None]) & (self.obottom > p_top[:, None]))
+        crashed = active & hit.any(axis=1)
+        self.done |= crashed
+        return self.observations(), np.where(active, passed, 0), self.done.copy()
+
+    def _spawn(self, i):
+        rng = self.rngs[i]
+        free = np.flatnonzero(~self.alive[i])
+        if len(free) == 0:
+            raise RuntimeError("не хватает слотов препятствий, увеличьте max_obstacles")
+        j = free[0]
+        if self.distance[i] >= PTERA_MIN_DISTANCE and rng.random() < PTERA_CHANCE:
+            min_bottom, max_bottom, fallback_bottom = pteranodon_band()
+            if min_bottom > max_bottom:
+                self.obottom[i, j] = fallback_bottom
+            else:
+                self.obottom[i, j] = rng.randint(min_bottom, max_bottom)
+            self.kind[i, j] = Pteranodon.KIND
+        else:
+            self.obottom[i, j] = HEIGHT
+            self.kind[i, j] = Cactus.KIND
+        self.ox[i, j] = WIDTH
+        self.alive[i, j] = True
+        self.spawn_timer[i] = 0
+        self.next_spawn[i] = rng.randint(SPAWN_INTERVAL_MIN, SPAWN_INTERVAL_MAX)
+
+    def observations(self):
+        # [n, 12] в том же порядке полей, что и GameState.observation()
+        obs = np.empty((self.n, 12))
+        obs[:, 0] = self.bottom
+        obs[:, 1] = self.vy
+        obs[:, 2] = self.on_ground
+        obs[:, 3] = self.ducking
+        p_left = np.where(self.ducking, DUCK_HIT[0], STAND_HIT[0])
+        p_right = p_left + np.where(self.ducking, DUCK_HIT[1], STAND_HIT[1])
+        o_left = self.ox + KIND_HIT_DX[self.kind]
+        ahead = self.alive & (o_left + KIND_HIT_W[self.kind] >= p_left[:, None])
+        order = np.argsort(np.where(ahead, self.ox, np.iinfo(np.int64).max), axis=1, kind="stable")
+        rows = np.arange(self.n)
+        for slot in range(2):
+            j = order[:, slot]
+            ok = ahead[rows, j]
+            kind = self.kind[rows, j]
+            base = 4 + slot * 4
+            obs[:, base] = np.where(ok, o_left[rows, j] - p_right, WIDTH)
+            obs[:, base + 1] = np.where(ok, kind, -1)
+            obs[:, base + 2] = np.where(ok, self.obottom[rows, j] - KIND_HIT_H[kind], 0)
+            obs[:, base + 3] = np.where(ok, self.obottom[rows, j], 0)
+        return obs
+
+
+# ---------------------------
+# Сверка с одиночным GameState и замер скорости
+# ---------------------------
+def check_against_single(seeds, max_steps=3000, action_seed=0, policy=None):
+    # Одинаковые действия для пакета и для каждого GameState. policy(obs, rng)
+    # выбирает их по наблюдениям пакета (выживающая политика доводит забеги
+    # до птеранодонов), без неё — случайные действия.
+    # Возвращает (расхождения, сколько забегов встретили птеранодона)
+    n = len(seeds)
+    if policy is None:
+        actions = np.random.RandomState(action_seed).choice(
+            [ACTION_NONE, ACTION_JUMP, ACTION_DUCK], size=(max_steps, n), p=[0.9, 0.04, 0.06])
+    else:
+        actions = np.full((max_steps, n), ACTION_NONE)
+        rngs = [random.Random(s) for s in seeds]
+    batch = BatchGameState(n)
+    batch_obs = [batch.reset(seeds)]
+    for t in range(max_steps):
+        if policy is not None:
+            obs = batch_obs[-1]
+            actions[t] = [policy(obs[i], rngs[i]) for i in range(n)]
+        obs, _, done = batch.step(actions[t])
+        batch_obs.append(obs)
+        if done.all():
+            break
+    mismatches = []
+    with_ptera = 0
+    for i, seed in enumerate(seeds):
+        game = GameState(decor=False, collision="hitbox")  # пакет считает по хитбоксам
+        game.reset(seed)
+        seen_ptera = False
+        for t in range(max_steps):
+            if game.done:
+                break
+            obs, _, _ = game.step(int(actions[t, i]))
+            seen_ptera = seen_ptera or any(o.KIND == Pteranodon.KIND for o in game.obstacles)
+            if tuple(float(v) for v in obs) != tuple(batch_obs[t + 1][i]):
+                mismatches.append((seed, t, "observation"))
+                break
+        with_ptera += seen_ptera
+        if (game.score, game.frames, game.done) != (batch.score[i], batch.frames[i], batch.done[i]):
+            mismatches.append((seed, game.frames, "итог забега"))
+    return mismatches, with_ptera
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная симуляция забегов Spino Run (NumPy)")
+    parser.add_argument("--runs", type=int, default=4096)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--check", type=int, default=0, metavar="N",
+                        help="только сверить N забегов с одиночным GameState (код 1 при расхождениях)")
+    args = parser.parse_args()
+
+    if args.check:
+        # только сверка: код возврата 1 при расхождениях, без замера скорости
+        seeds = list(range(args.check))
+        mismatches, _ = check_against_single(seeds)
+        # вторая половина — забеги под reflex-политикой, доходящие до птеранодонов
+        reflex_mismatches, with_ptera = check_against_single(seeds, policy=policy_reflex)
+        mismatches += reflex_mismatches
+        print(f"сверка: {args.check} забегов x 2 (случайные действия, reflex), расхождений: {len(mismatches)}, "
+              f"с птеранодонами: {with_ptera}")
+        for m in mismatches[:10]:
+            print("  ", m)
+        return 1 if mismatches else 0
+
+    batch = BatchGameState(args.runs)
+    batch.reset(list(range(args.runs)))
+    rng = np.random.RandomState(1)
+    t0 = time.perf_counter()
+    for _ in range(args.steps):
+        batch.step(rng.choice([ACTION_NONE, ACTION_JUMP], size=args.runs, p=[0.97, 0.03]))
+    elapsed = time.perf_counter() - t0
+    print(f"{args.runs} забегов x {args.steps} шагов: {args.runs * args.steps / elapsed:,.0f} шагов/с")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,331 @@
+import argparse
+import atexit
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# без окна и звука; пути к assets/ и sounds/ — относительно папки игры
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+import spino_runner as sr
+from spino_rollout import policy_reflex
+
+# ---------------------------
+# Замеры горячих путей отрисовки и симуляции. Каждый замер — функция
+# setup(ctx) -> callable; время одного вызова пишется в миллисекундах.
+# Итог можно сохранить как базовую линию (JSON) и сравнивать с ней
+# ---------------------------
+BASELINE_FILE = "bench_baseline.json"
+DEFAULT_THRESHOLD = 0.15  # регрессия — p50 медленнее базовой линии больше чем на 15%
+SCENE_SEED = 12345
+
+class BenchContext:
+    # общие ресурсы замеров: окно, шрифты, деревья — создаются один раз
+    def __init__(self):
+        pygame.mixer.pre_init(*sr.MIXER_SETTINGS)  # как в main(): от формата зависят звуки пакета
+        pygame.init()
+        self.screen = pygame.display.set_mode((sr.WIDTH, sr.HEIGHT))
+        sr.SPRITES.preload()
+        self.font_ui = pygame.font.SysFont("arial", 20)
+        self.font_big = sr.get_font_artegra(36, bold=False)
+        self.font_huge = sr.get_font_artegra(72, bold=True)
+        self.tree_images = sr.load_tree_variants()
+        self.tree_cache = sr.TreeBillboardCache(self.tree_images)
+        self.tree_cache.prewarm(sr.tree_prewarm_scale())
+
+    def canvas(self):
+        # холст фона того же размера, что у Compositor
+        factor = max(1, int(sr.PIXELATE_FACTOR)) if sr.NATIVE_LOWRES else 1
+        return pygame.Surface((sr.WIDTH // factor, sr.HEIGHT // factor), 0, self.screen)
+
+# ---------------------------
+# Микрозамеры
+# ---------------------------
+def bench_noise(ctx):
+    noise = sr.FractalNoise1D(seed=4242, base_freq=1/330.0)
+    xs = iter(range(10 ** 9))
+    return lambda: noise.noise(next(xs) * 0.5)
+
+def bench_noise_array(ctx):
+    if sr.np is None:
+        return None
+    noise = sr.FractalNoise1D(seed=4242, base_freq=1/330.0)
+    xs = sr.np.arange(sr.WIDTH + 2, dtype=float)
+    state = {"x0": 0.0}
+    def run():
+        noise.noise_array(xs + state["x0"])
+        state["x0"] += sr.SCROLL_SPEED
+    return run
+
+def bench_ensure_columns(ctx):
+    # досчёт колонок шума при прокрутке — несколько новых колонок справа за шаг
+    layer = sr.Background(ctx.tree_images, ctx.tree_cache, random.Random(SCENE_SEED)).hills_near
+    def run():
+        layer.update()
+        w0 = int(layer.offset)
+        layer.ensure_columns(w0, w0 + sr.WIDTH + 2)
+    return run
+
+def bench_render_chunk(ctx):
+    # новая полоса ближнего слоя с деревьями в разрешении холста, как в HillNoiseLayer.draw
+    layer = sr.Background(ctx.tree_images, ctx.tree_cache, random.Random(SCENE_SEED)).hills_near
+    scale = ctx.canvas().get_width() / sr.WIDTH
+    cw = max(1, round(sr.STRIP_CHUNK_W * scale))
+    chunk = pygame.Surface((cw, max(1, round((layer.poly_base_y - layer.strip_top) * scale))), pygame.SRCALPHA)
+    layer.chunk_trees = True
+    chunks = iter(range(10 ** 9))
+    def run():
+        chunk.fill((0, 0, 0, 0))
+        layer._render_chunk(chunk, next(chunks), cw, scale)
+    return run
+
+def bench_draw_to_surface(ctx):
+    background = sr.Background(ctx.tree_images, ctx.tree_cache, random.Random(SCENE_SEED))
+    canvas = ctx.canvas()
+    def run():
+        background.update()
+        background.draw_to_surface(canvas)
+    return run
+
+def bench_pixelate_surface(ctx):
+    factor = max(2, int(sr.PIXELATE_FACTOR))
+    frame = ctx.screen.copy()
+    small = pygame.Surface((sr.WIDTH // factor, sr.HEIGHT // factor), 0, frame)
+    dest = pygame.Surface(frame.get_size(), 0, frame)
+    return lambda: sr.pixelate_surface(frame, factor, small, dest)
+
+def bench_draw_outlined_text(ctx):
+    return lambda: sr.draw_outlined_text(ctx.screen, "Spino Run", ctx.font_huge, (sr.WIDTH // 2, 90),
+                                         fg=sr.WHITE, outline_color=sr.BLACK, outline_w=3)
+
+def bench_draw_outlined_text_cold(ctx):
+    # каждый раз новая строка — промах кеша текста
+    scores = iter(range(10 ** 9))
+    return lambda: sr.draw_outlined_text(ctx.screen, f"Score: {next(scores)}", ctx.font_big,
+                                         (sr.WIDTH // 2, 150))
+
+def bench_button_draw(ctx):
+    button = sr.Button(pygame.Rect(0, 0, 260, 52), "Играть", ctx.font_big, sr.WHITE, (0,0,0,80), (0,0,0,140))
+    button.rect.center = (sr.WIDTH // 2, 180)
+    frame = iter(range(10 ** 9))
+    return lambda: button.draw(ctx.screen, selected=next(frame) % 60 < 30)
+
+def bench_game_step(ctx):
+    game = sr.GameState(ctx.tree_images, ctx.tree_cache)
+    game.reset(SCENE_SEED)
+    rng = random.Random(SCENE_SEED)
+    def run():
+        if game.done:
+            game.reset(SCENE_SEED)
+        game.step(policy_reflex(game.observation(), rng))
+    return run
+
+# ---------------------------
+# Сцена целиком: кадр "playing" как в main() — шаг, мир, счёт, flip
+# ---------------------------
+def bench_scene(ctx):
+    game = sr.GameState(ctx.tree_images, ctx.tree_cache)
+    obs = game.reset(SCENE_SEED)
+    rng = random.Random(SCENE_SEED)
+    compositor = sr.Compositor()
+    screen = ctx.screen
+    def run():
+        nonlocal obs
+        if game.done:
+            obs = game.reset(SCENE_SEED)
+        obs, _, _ = game.step(policy_reflex(obs, rng))
+        compositor.draw_world(screen, game, 0.5)
+        sr.TEXT_CACHE.draw_glyphs(screen, ctx.font_ui, f"Score: {game.score}   Distance: {int(game.distance)}",
+                                  sr.BLACK, (10, 10))
+        sr.TEXT_CACHE.draw_glyphs(screen, ctx.font_ui, "Best Score: 0   Best Distance: 0", sr.BLACK, (10, 35))
+        pygame.display.flip()
+    return run
+
+# ---------------------------
+# Запуск: загрузка спрайтов, деревьев и звуков с диска (PNG/WAV + масштаб)
+# против пакета ассетов через mmap
+# ---------------------------
+def bench_startup_files(ctx):
+    def run():
+        sr.SPRITES = sr.SpriteRegistry()
+        sr.load_assets(use_pack=False)
+    return run
+
+def bench_startup_pack(ctx):
+    path = os.path.join(tempfile.gettempdir(), f"spino_bench_{os.getpid()}.pack")
+    sr.SPRITES = sr.SpriteRegistry()
+    sr.load_assets(pack_path=path)  # собрать пакет
+    atexit.register(lambda: os.path.exists(path) and os.remove(path))
+    def run():
+        sr.SPRITES = sr.SpriteRegistry()
+        sr.load_assets(pack_path=path)
+    return run
+
+BENCHMARKS = {
+    "noise": (bench_noise, 2000),
+    "noise_array": (bench_noise_array, 300),
+    "ensure_columns": (bench_ensure_columns, 2000),
+    "render_chunk": (bench_render_chunk, 300),
+    "draw_to_surface": (bench_draw_to_surface, 600),
+    "pixelate_surface": (bench_pixelate_surface, 600),
+    "draw_outlined_text": (bench_draw_outlined_text, 2000),
+    "draw_outlined_text_cold": (bench_draw_outlined_text_cold, 300),
+    "button_draw": (bench_button_draw, 2000),
+    "game_step": (bench_game_step, 2000),
+    "scene": (bench_scene, 1200),
+    "startup_files": (bench_startup_files, 5),
+    "startup_pack": (bench_startup_pack, 50),
+}
+
+# ---------------------------
+# Замер, статистика, базовая линия
+# ---------------------------
+def percentile(sorted_values, q):
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+def calibrate(fn, target_ms=0.1, probe=50):
+    # сколько вызовов склеить в одну выборку, чтобы она длилась ~target_ms:
+    # у очень быстрых функций иначе замеряется в основном сам таймер
+    t0 = time.perf_counter()
+    calls = 0
+    while calls < probe and (time.perf_counter() - t0) * 1000.0 < target_ms * probe:
+        fn()
+        calls += 1
+    per_call_ms = (time.perf_counter() - t0) * 1000.0 / calls
+    return max(1, int(target_ms / max(per_call_ms, 1e-6)))
+
+def measure(fn, samples, inner=1, warmup=None):
+    if warmup is None:
+        warmup = min(20, max(1, samples // 5))
+    for _ in range(warmup):
+        fn()
+    clock = time.perf_counter_ns
+    loop = range(inner)
+    times = []
+    for _ in range(samples):
+        t0 = clock()
+        for _ in loop:
+            fn()
+        times.append(clock() - t0)
+    times = sorted(t / 1e6 / inner for t in times)
+    return {
+        "samples": samples,
+        "inner": inner,
+        "mean": sum(times) / samples,
+        "p50": percentile(times, 50),
+        "p95": percentile(times, 95),
+        "p99": percentile(times, 99),
+    }
+
+def run_benchmarks(names, frames=None, scale=1.0, rounds=3):
+    # из нескольких прогонов берётся лучший по p50: фоновая нагрузка
+    # машины только замедляет, поэтому минимум устойчивее среднего
+    ctx = BenchContext()
+    results = {}
+    for name in names:
+        setup, samples = BENCHMARKS[name]
+        fn = setup(ctx)
+        if fn is None:
+            print(f"[!] {name}: пропущен (нет numpy)")
+            continue
+        if name == "scene":
+            # время кадра — по одному кадру на выборку
+            samples, inner = frames or samples, 1
+        else:
+            samples, inner = max(10, int(samples * scale)), calibrate(fn)
+        runs = [measure(fn, samples, inner) for _ in range(max(1, rounds))]
+        results[name] = min(runs, key=lambda r: r["p50"])
+    pygame.quit()
+    return results
+
+def compare(results, baseline, threshold):
+    # список (имя, было p50, стало p50, изменение) для замедлившихся больше threshold
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base or base["p50"] <= 0:
+            continue
+        change = stats["p50"] / base["p50"] - 1.0
+        if change > threshold:
+            regressions.append((name, base["p50"], stats["p50"], change))
+    return regressions
+
+def print_results(results, baseline=None):
+    print(f"{'замер':<24}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}   (мс)")
+    for name, s in results.items():
+        line = f"{name:<24}{s['mean']:>10.4f}{s['p50']:>10.4f}{s['p95']:>10.4f}{s['p99']:>10.4f}"
+        base = (baseline or {}).get(name)
+        if base and base["p50"] > 0:
+            line += f"   p50 {s['p50'] / base['p50'] - 1.0:+.1%}"
+        print(line)
+
+def load_baseline(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["results"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[!] Не удалось прочитать базовую линию {path}: {e}")
+        return None
+
+def save_baseline(path, results):
+    data = {
+        "python": sys.version.split()[0],
+        "pygame": pygame.version.ver,
+        "pixelate_factor": sr.PIXELATE_FACTOR,
+        "native_lowres": sr.NATIVE_LOWRES,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности Spino Run (без окна)")
+    parser.add_argument("names", nargs="*", help=f"замеры (по умолчанию все): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--frames", type=int, default=None, help="кадров в замере scene")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель числа повторов микрозамеров")
+    parser.add_argument("--rounds", type=int, default=3, help="прогонов каждого замера (берётся лучший)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как базовую линию")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление p50 относительно базовой линии (доля)")
+    args = parser.parse_args()
+
+    unknown = [n for n in args.names if n not in BENCHMARKS]
+    if unknown:
+        parser.error(f"неизвестные замеры: {', '.join(unknown)}")
+    results = run_benchmarks(args.names or list(BENCHMARKS), args.frames, args.scale, args.rounds)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print_results(results)
+        print(f"базовая линия записана: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, change in regressions:
+        print(f"[!] {name}: p50 {before:.4f} -> {after:.4f} мс ({change:+.1%})")
+    if regressions:
+        print(f"регрессий: {len(regressions)} (порог {args.threshold:.0%})")
+        return 1
+    print(f"регрессий нет (порог {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import argparse
+import csv
+import multiprocessing as mp
+import os
+import random
+import time
+from collections import Counter, namedtuple
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # без приветствия pygame в каждом процессе
+
+import spino_runner
+from spino_runner import (
+    SIM_HZ, ACTION_NONE, ACTION_JUMP, ACTION_DUCK,
+    Cactus, Pteranodon, GameState,
+)
+
+# ---------------------------
+# Прогон забегов без окна на всех ядрах: сиды режутся на пачки, процессы
+# берут пачки из очереди задач и шлют результат каждого забега в
+# ограниченную очередь результатов. Забег зависит только от seed, политики
+# и настроек, поэтому итог (отсортированный по seed) воспроизводим при
+# любом числе процессов
+# ---------------------------
+RunResult = namedtuple("RunResult", "seed score distance cause frames")
+
+DEFAULT_MAX_FRAMES = SIM_HZ * 60 * 10  # 10 минут игрового времени
+RESULT_QUEUE_SIZE = 1024
+CAUSE_NAMES = {Cactus.KIND: "cactus", Pteranodon.KIND: "pteranodon"}
+
+# константы spino_runner, которые можно переопределить через --set ИМЯ=ЗНАЧЕНИЕ
+TUNABLES = (
+    "SAFE_GAP", "SPAWN_FIRST_MIN", "SPAWN_FIRST_MAX", "SPAWN_INTERVAL_MIN", "SPAWN_INTERVAL_MAX",
+    "PTERA_MIN_DISTANCE", "PTERA_CHANCE", "SCROLL_SPEED", "GRAVITY", "JUMP_V", "COLLISION_MODE",
+)
+
+# ---------------------------
+# Политики: policy(obs, rng) -> ACTION_*. obs — GameState.observation()
+# ---------------------------
+REFLEX_JUMP_DIST = 40
+REFLEX_DUCK_DIST = 120
+
+def policy_idle(obs, rng):
+    return ACTION_NONE
+
+def policy_random(obs, rng):
+    r = rng.random()
+    if r < 0.03:
+        return ACTION_JUMP
+    if r < 0.08:
+        return ACTION_DUCK
+    return ACTION_NONE
+
+def policy_reflex(obs, rng):
+    # прыгаем через кактус, пригибаемся под птеранодона
+    dist, kind = obs[4], obs[5]
+    if kind == Cactus.KIND and dist < REFLEX_JUMP_DIST:
+        return ACTION_JUMP
+    if kind == Pteranodon.KIND and dist < REFLEX_DUCK_DIST:
+        return ACTION_DUCK
+    return ACTION_NONE
+
+POLICIES = {
+    "idle": policy_idle,
+    "random": policy_random,
+    "reflex": policy_reflex,
+}
+
+# ---------------------------
+# Один забег и процесс-исполнитель
+# ---------------------------
+def run_one(game, seed, policy, max_frames):
+    obs = game.reset(seed)
+    rng = random.Random(seed)  # своя случайность политики, не трогает rng игры
+    while not game.done and game.frames < max_frames:
+        obs, _, _ = game.step(policy(obs, rng))
+    cause = CAUSE_NAMES[game.killed_by] if game.done else "timeout"
+    return RunResult(seed, game.score, game.distance, cause, game.frames)
+
+def parse_overrides(items):
+    overrides = {}
+    for item in items or ():
+        name, sep, value = item.partition("=")
+        name = name.strip()
+        if not sep or name not in TUNABLES:
+            raise ValueError(f"ожидается ИМЯ=ЗНАЧЕНИЕ, ИМЯ из: {', '.join(TUNABLES)}; получено {item!r}")
+        old = getattr(spino_runner, name)
+        overrides[name] = value.strip() if isinstance(old, str) else type(old)(float(value))
+    return overrides
+
+def apply_overrides(overrides):
+    # возвращает прежние значения, чтобы их можно было вернуть
+    old = {name: getattr(spino_runner, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(spino_runner, name, value)
+    return old
+
+def _worker(tasks, results, policy_name, max_frames, overrides):
+    try:
+        apply_overrides(overrides)
+        policy = POLICIES[policy_name]
+        game = GameState(decor=False)
+        while True:
+            chunk = tasks.get()
+            if chunk is None:
+                break
+            for seed in chunk:
+                results.put(run_one(game, seed, policy, max_frames))
+    except Exception as e:
+        results.put(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        results.put(None)
+
+def rollout(seeds, policy="reflex", workers=None, max_frames=DEFAULT_MAX_FRAMES,
+            overrides=None, chunk_size=None, queue_size=RESULT_QUEUE_SIZE, on_result=None):
+    # возвращает список RunResult, отсортированный по seed; on_result(result)
+    # вызывается по мере поступления результатов (порядок произвольный)
+    if policy not in POLICIES:
+        raise ValueError(f"неизвестная политика {policy!r}, есть: {', '.join(POLICIES)}")
+    seeds = list(seeds)
+    overrides = overrides or {}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(seeds) or 1))
+    collected = []
+
+    if workers == 1:
+        # без процессов: удобно для отладки и сверки воспроизводимости
+        old = apply_overrides(overrides)
+        try:
+            game = GameState(decor=False)
+            for seed in seeds:
+                result = run_one(game, seed, POLICIES[policy], max_frames)
+                collected.append(result)
+                if on_result:
+                    on_result(result)
+        finally:
+            apply_overrides(old)
+        return sorted(collected, key=lambda r: r.seed)
+
+    if chunk_size is None:
+        # мелкие пачки выравнивают нагрузку: забеги сильно разной длины
+        chunk_size = max(1, min(64, len(seeds) // (workers * 8)))
+    tasks = mp.Queue()
+    results = mp.Queue(maxsize=queue_size)
+    for i in range(0, len(seeds), chunk_size):
+        tasks.put(seeds[i:i + chunk_size])
+    for _ in range(workers):
+        tasks.put(None)
+    procs = [mp.Process(target=_worker, args=(tasks, results, policy, max_frames, overrides), daemon=True)
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+
+    errors = []
+    running = workers
+    while running:
+        item = results.get()
+        if item is None:
+            running -= 1
+        elif isinstance(item, RunResult):
+            collected.append(item)
+            if on_result:
+                on_result(item)
+        else:
+            errors.append(item[1])
+    for p in procs:
+        p.join()
+    if errors:
+        raise RuntimeError(f"ошибка в процессе прогона: {errors[0]}")
+    return sorted(collected, key=lambda r: r.seed)
+
+# ---------------------------
+# Сводка
+# ---------------------------
+def percentile(sorted_values, q):
+    # линейная интерполяция между соседними рангами
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+def summarize(results, percentiles=(5, 50, 90, 99)):
+    summary = {"runs": len(results), "causes": Counter(r.cause for r in results)}
+    for field in ("score", "distance", "frames"):
+        values = sorted(getattr(r, field) for r in results)
+        stats = {"mean": sum(values) / len(values) if values else 0.0}
+        for q in percentiles:
+            stats[f"p{q}"] = percentile(values, q)
+        stats["max"] = values[-1] if values else 0
+        summary[field] = stats
+    return summary
+
+def print_summary(summary, elapsed):
+    runs = summary["runs"]
+    frames = summary["frames"]["mean"] * runs
+    print(f"забегов: {runs}, шагов: {frames:,.0f}, за {elapsed:.2f} с "
+          f"({runs / elapsed:,.1f} забегов/с, {frames / elapsed:,.0f} шагов/с)")
+    for field in ("score", "distance", "frames"):
+        stats = summary[field]
+        print(f"  {field:>8}: " + "  ".join(f"{k}={v:,.1f}" for k, v in stats.items()))
+    causes = ", ".join(f"{name}: {count}" for name, count in summary["causes"].most_common())
+    print(f"  причины: {causes}")
+
+def write_csv(path, results):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(RunResult._fields)
+        writer.writerows(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Прогон забегов Spino Run на всех ядрах")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="reflex")
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--seed-start", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=0, help="число процессов (0 — по числу ядер)")
+    parser.add_argument("--max-frames", type=int, default=DEFAULT_MAX_FRAMES)
+    parser.add_argument("--chunk", type=int, default=None, help="сидов в одной задаче")
+    parser.add_argument("--set", action="append", metavar="ИМЯ=ЗНАЧЕНИЕ", dest="overrides",
+                        help=f"переопределить константу: {', '.join(TUNABLES)}")
+    parser.add_argument("--csv", help="записать результаты по забегам (по порядку seed)")
+    args = parser.parse_args()
+
+    try:
+        overrides = parse_overrides(args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+    seeds = range(args.seed_start, args.seed_start + args.runs)
+    t0 = time.perf_counter()
+    results = rollout(seeds, args.policy, args.workers or None, args.max_frames, overrides, args.chunk)
+    elapsed = time.perf_counter() - t0
+    print_summary(summarize(results), elapsed)
+    if args.csv:
+        write_csv(args.csv, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,39 @@
 import pygame
+import argparse
 import random
 import os
 import math
+import csv
+import time
+import struct
+import json
+import mmap
+import hashlib
+import threading
+import queue
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np  # необязательно: векторный расчёт шума холмов
+except ImportError:
+    np = None
 
 # ---------------------------
 # Настройки окна и игры
 # ---------------------------
 WIDTH, HEIGHT = 800, 400
-FPS = 60
+FPS = 60  # ограничение частоты кадров рендера; 0 — без ограничения
+
+# Симуляция идёт фиксированными шагами независимо от частоты кадров.
+# Все скорости в игре заданы «за шаг», шаг = 1/60 c
+SIM_HZ = 60
+SIM_DT = 1.0 / SIM_HZ
+MAX_SIM_STEPS = 5     # больше шагов за кадр не догоняем (иначе «спираль смерти»)
+MAX_FRAME_DT = 0.25
 TITLE = "Спинозавр: кактусы и птеранодоны"
 ASSETS_DIR = "assets"
-RECORD_FILE = "records.txt"
+RECORD_FILE = "records.txt"  # старый формат, переносится в RECORDS_FILE
 
 # ---------------------------
 # Путь к звукам
@@ -22,6 +45,10 @@ SND_CHECKPOINT = os.path.join(SOUND_DIR, "checkpoint.wav")
 SND_DEATH = os.path.join(SOUND_DIR, "death.wav")
 SND_MENU_CLICK = os.path.join(SOUND_DIR, "menu_click.wav")
 SND_MENU_HOVER = os.path.join(SOUND_DIR, "menu_hover.wav")
+SOUND_FILES = (SND_JUMP, SND_CHECKPOINT, SND_DEATH, SND_MENU_CLICK, SND_MENU_HOVER)
+
+# Микшер: частота, формат, каналы, буфер (в сэмплах) — маленький буфер = меньше задержка
+MIXER_SETTINGS = (44100, -16, 2, 512)
 
 # ---------------------------
 # Константы размеров
@@ -42,6 +69,16 @@ CHECKPOINT_STEP = 500.0
 HITBOX_SCALE = 0.7
 SAFE_GAP = 10
 
+# Столкновения: "mask" — попиксельно по маскам спрайтов (точнее),
+# "hitbox" — по уменьшенным в HITBOX_SCALE прямоугольникам (как в spino_batch)
+COLLISION_MODE = "mask"
+
+# Спавн препятствий (в шагах симуляции)
+SPAWN_FIRST_MIN, SPAWN_FIRST_MAX = 50, 95        # до первого препятствия
+SPAWN_INTERVAL_MIN, SPAWN_INTERVAL_MAX = 55, 100  # между следующими
+PTERA_MIN_DISTANCE = 500.0  # птеранодоны появляются с этой дистанции
+PTERA_CHANCE = 0.4
+
 # ---------------------------
 # Разметка фона
 # ---------------------------
@@ -51,6 +88,10 @@ SKY_H    = HEIGHT - GROUND_H - HILLS_H
 GROUND_TOP = HEIGHT - GROUND_H
 
 PIXELATE_FACTOR = 2
+# True: фон сразу рисуется в холст WIDTH//PIXELATE_FACTOR x HEIGHT//PIXELATE_FACTOR
+# и один раз растягивается на экран. False: рисуем в полном размере и
+# прогоняем через pixelate_surface (старый путь)
+NATIVE_LOWRES = True
 
 # ---------------------------
 # Цвета
@@ -74,6 +115,13 @@ FERN_COLOR   = (25, 85, 50)
 TREE_BASE_W, TREE_BASE_H = 48, 64
 TREE_SPACING = 200
 TREE_Y_OFFSET = 14
+# запас по x, чтобы дерево на стыке двух полос попало в обе
+TREE_MARGIN = int(TREE_BASE_W * 1.2) // 2 + 1
+# масштабы деревьев квантуются шагом 0.05 в диапазоне 0.85–1.20
+TREE_SCALE_STEPS = range(round(0.85 / 0.05), round(1.20 / 0.05) + 1)
+TREE_CACHE_SIZE = 64
+TREES_ENABLED = True     # деревья на ближних холмах
+TREE_SMOOTHSCALE = True  # False — билборды масштабируются без сглаживания (дешевле)
 
 # ---------------------------
 # Облака
@@ -85,13 +133,19 @@ CLOUD_SPAWN_OFFSET_MAX = 150
 # Оптимизация холмов
 # ---------------------------
 HILL_SAMPLE_STEP = 2
+# Ширина заранее отрисованной полосы слоя параллакса (холмы + деревья).
+# При ширине >= WIDTH на экране одновременно не больше двух полос
+STRIP_CHUNK_W = WIDTH
 
 # ---------------------------
 # Утилиты
 # ---------------------------
 def load_image(name, size):
     path = os.path.join(ASSETS_DIR, name)
-    img = pygame.image.load(path).convert_alpha()
+    img = pygame.image.load(path)
+    # без окна (headless) convert_alpha недоступен — оставляем как есть
+    if pygame.display.get_init() and pygame.display.get_surface() is not None:
+        img = img.convert_alpha()
     return pygame.transform.scale(img, size)
 
 def try_load_image(path):
@@ -99,10 +153,11 @@ def try_load_image(path):
         return pygame.image.load(path).convert_alpha()
     return None
 
+TREE_FILES = ("tree1.png", "tree2.png", "tree3.png")
+
 def load_tree_variants():
-    names = ["tree1.png", "tree2.png", "tree3.png"]
     imgs = []
-    for n in names:
+    for n in TREE_FILES:
         p = os.path.join(ASSETS_DIR, n)
         img = try_load_image(p)
         if img:
@@ -125,39 +180,297 @@ def load_tree_variants():
         pygame.draw.polygon(surf, (28, 88, 46), poly, 2)
     return [surf]
 
-def pixelate_surface(surface, factor):
+# ---------------------------
+# Реестр спрайтов: каждый PNG декодируется и масштабируется один раз,
+# дальше все экземпляры делят одну и ту же Surface
+# ---------------------------
+SPRITE_SIZES = {
+    "spino_stand.png": (SPINO_STAND_W, SPINO_STAND_H),
+    "spino_duck.png":  (SPINO_DUCK_W,  SPINO_DUCK_H),
+    "cactus.png":      (CACTUS_W,      CACTUS_H),
+    "pteranodon.png":  (PTERA_W,       PTERA_H),
+}
+
+class SpriteRegistry:
+    def __init__(self):
+        self.surfaces = {}  # (name, w, h) -> Surface
+        self.masks = {}     # (name, w, h) -> pygame.mask.Mask для столкновений
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, size):
+        key = (name, size[0], size[1])
+        surf = self.surfaces.get(key)
+        if surf is None:
+            # промах = чтение с диска + декодирование + scale
+            self.misses += 1
+            surf = load_image(name, size)
+            self.surfaces[key] = surf
+        else:
+            self.hits += 1
+        return surf
+
+    def mask(self, name, size):
+        key = (name, size[0], size[1])
+        mask = self.masks.get(key)
+        if mask is None:
+            mask = pygame.mask.from_surface(self.get(name, size))
+            self.masks[key] = mask
+        return mask
+
+    def add(self, name, size, surf):
+        # готовая Surface нужного размера (например, из пакета ассетов)
+        self.surfaces[(name, size[0], size[1])] = surf
+
+    def preload(self, sizes=SPRITE_SIZES):
+        for name, size in sizes.items():
+            self.mask(name, size)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self.surfaces), "masks": len(self.masks)}
+
+SPRITES = SpriteRegistry()
+
+# ---------------------------
+# Пул сущностей: облака, папоротники и препятствия не пересоздаются,
+# а переиспользуются через reset()
+# ---------------------------
+class EntityPool:
+    def __init__(self):
+        self.free = {}  # класс -> [свободные объекты]
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, cls, *args):
+        stack = self.free.get(cls)
+        if stack:
+            obj = stack.pop()
+            obj.reset(*args)
+            self.reused += 1
+        else:
+            obj = cls(*args)
+            self.created += 1
+        return obj
+
+    def release(self, obj):
+        stack = self.free.get(type(obj))
+        if stack is None:
+            stack = self.free[type(obj)] = []
+        stack.append(obj)
+
+def update_swap_remove(items, pool, *args):
+    # update() возвращает True, если объект истёк; истёкший меняем местами
+    # с последним и снимаем с конца — O(1) без копии списка
+    expired = 0
+    i = 0
+    n = len(items)
+    while i < n:
+        obj = items[i]
+        if obj.update(*args):
+            n -= 1
+            items[i] = items[n]
+            items.pop()
+            pool.release(obj)
+            expired += 1
+        else:
+            i += 1
+    return expired
+
+def pixelate_surface(surface, factor, small=None, dest=None):
+    # small/dest — готовые буферы нужного размера, чтобы не выделять их каждый кадр
     if factor <= 1:
         return surface
     w, h = surface.get_size()
     small_w = max(1, w // factor)
     small_h = max(1, h // factor)
-    small = pygame.transform.scale(surface, (small_w, small_h))
-    return pygame.transform.scale(small, (w, h))
+    if small is None:
+        small = pygame.transform.scale(surface, (small_w, small_h))
+    else:
+        pygame.transform.scale(surface, (small_w, small_h), small)
+    if dest is None:
+        return pygame.transform.scale(small, (w, h))
+    pygame.transform.scale(small, (w, h), dest)
+    return dest
 
 # ---------------------------
 # Рекорды
 # ---------------------------
-def load_records():
-    if not os.path.exists(RECORD_FILE):
-        return 0, 0
-    try:
-        with open(RECORD_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        score = int(lines[0].split("=")[1]) if len(lines) > 0 else 0
-        distance = int(lines[1].split("=")[1]) if len(lines) > 1 else 0
-        return score, distance
-    except:
-        return 0, 0
-
-def save_records(score, distance):
-    with open(RECORD_FILE, "w", encoding="utf-8") as f:
-        f.write(f"score={score}\n")
-        f.write(f"distance={distance}\n")
+# Журнал забегов (runs.log) — только дописывается: заголовок и записи
+# фиксированного размера, так что запись N лежит по смещению и читается без
+# остального файла. Таблица рекордов (records.json) — лучшие значения и
+# топ-N с номерами записей в журнале; она переписывается целиком через
+# временный файл и os.replace. Всё, что пишет на диск, идёт в фоновом
+# потоке; старый records.txt (score=/distance=) переносится один раз
+RECORDS_FILE = "records.json"
+RUN_LOG_FILE = "runs.log"
+RUN_LOG_MAGIC = b"SPRL"
+RUN_LOG_VERSION = 1
+RUN_LOG_HEADER = struct.Struct("<4sB")
+RUN_LOG_ENTRY = struct.Struct("<IIIQIB")  # счёт, дистанция, шаги, seed, время (unix), погиб
+LEADERBOARD_SIZE = 10
+
+class RecordsStore:
+    def __init__(self, path=RECORDS_FILE, log_path=RUN_LOG_FILE, legacy_path=RECORD_FILE, top_n=LEADERBOARD_SIZE):
+        self.path = path
+        self.log_path = log_path
+        self.top_n = top_n
+        self.best_score = 0
+        self.best_distance = 0
+        self.runs = 0   # записей в журнале
+        self.top = []   # [{"score", "distance", "frames", "seed", "time", "index"}] по убыванию счёта
+        self.queue = queue.Queue()
+        self.thread = None
+        if self._load():
+            if self._catch_up():
+                self._write_table(self._table())
+        else:
+            # журнал и старый файл дополняют друг друга: в records.txt могут
+            # быть рекорды, которых нет в журнале
+            rebuilt = self._rebuild_from_log()
+            if self._migrate(legacy_path) or rebuilt:
+                self._write_table(self._table())
+
+    def _load(self):
+        # поля присваиваются только после разбора всей таблицы: при порче
+        # восстановление из журнала начинается с чистого состояния
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            best_score = int(data["best_score"])
+            best_distance = int(data["best_distance"])
+            runs = int(data["runs"])
+            top = [dict(r, index=int(r["index"]), score=int(r["score"]), distance=int(r["distance"]))
+                   for r in data["top"]]
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[!] Таблица рекордов повреждена, восстанавливаю из журнала: {self.path} ({e})")
+            return False
+        self.best_score, self.best_distance, self.runs, self.top = best_score, best_distance, runs, top
+        return True
+
+    def _catch_up(self):
+        # журнал пишется раньше таблицы: после сбоя между ними в нём есть
+        # забеги, которых таблица не видела. Их число — по размеру файла,
+        # читается только этот хвост
+        try:
+            with open(self.log_path, "rb") as f:
+                count = (os.fstat(f.fileno()).st_size - RUN_LOG_HEADER.size) // RUN_LOG_ENTRY.size
+                if count <= self.runs:
+                    return False
+                if RUN_LOG_HEADER.unpack(f.read(RUN_LOG_HEADER.size)) != (RUN_LOG_MAGIC, RUN_LOG_VERSION):
+                    print(f"[!] Журнал забегов в неизвестном формате: {self.log_path}")
+                    return False
+                f.seek(RUN_LOG_HEADER.size + self.runs * RUN_LOG_ENTRY.size)
+                tail = f.read((count - self.runs) * RUN_LOG_ENTRY.size)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"[!] Не удалось прочитать журнал забегов: {self.log_path} ({e})")
+            return False
+        for index, entry in enumerate(RUN_LOG_ENTRY.iter_unpack(tail), self.runs):
+            self._account(index, *entry)
+        self.runs = count
+        return True
+
+    def _rebuild_from_log(self):
+        # только при отсутствии/порче таблицы — здесь журнал читается целиком
+        try:
+            with open(self.log_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"[!] Не удалось прочитать журнал забегов: {self.log_path} ({e})")
+            return False
+        if len(data) < RUN_LOG_HEADER.size or RUN_LOG_HEADER.unpack_from(data) != (RUN_LOG_MAGIC, RUN_LOG_VERSION):
+            print(f"[!] Журнал забегов в неизвестном формате: {self.log_path}")
+            return False
+        body = data[RUN_LOG_HEADER.size:]
+        body = body[:len(body) - len(body) % RUN_LOG_ENTRY.size]  # недописанная запись после сбоя
+        for index, entry in enumerate(RUN_LOG_ENTRY.iter_unpack(body)):
+            self._account(index, *entry)
+        self.runs = len(body) // RUN_LOG_ENTRY.size
+        return True
+
+    def _migrate(self, legacy_path):
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                fields = dict(line.strip().split("=", 1) for line in f if "=" in line)
+            self.best_score = max(self.best_score, int(fields.get("score", 0)))
+            self.best_distance = max(self.best_distance, int(fields.get("distance", 0)))
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"[!] Не удалось перенести старые рекорды: {legacy_path} ({e})")
+            return False
+        return True
+
+    def _account(self, index, score, distance, frames, seed, when, died):
+        self.best_score = max(self.best_score, score)
+        self.best_distance = max(self.best_distance, distance)
+        self.top.append({"score": score, "distance": distance, "frames": frames, "seed": seed,
+                         "time": when, "index": index})
+        self.top.sort(key=lambda r: (-r["score"], -r["distance"], r["index"]))
+        del self.top[self.top_n:]
+
+    def _table(self):
+        return {"version": 1, "best_score": self.best_score, "best_distance": self.best_distance,
+                "runs": self.runs, "top": [dict(r) for r in self.top]}
+
+    def add_run(self, score, distance, frames, seed, died=True):
+        # главный поток: рекорды обновляются сразу, запись на диск — в фоне
+        entry = (score, distance, frames, seed & 0xFFFFFFFFFFFFFFFF, int(time.time()), int(died))
+        self._account(self.runs, *entry)
+        self.runs += 1
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._writer, name="records", daemon=True)
+            self.thread.start()
+        self.queue.put((RUN_LOG_ENTRY.pack(*entry), self._table()))
+
+    def close(self):
+        # дождаться записи всего, что накопилось
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def _writer(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            entry, table = item
+            try:
+                self._append_log(entry)
+                self._write_table(table)
+            except OSError as e:
+                print(f"[!] Не удалось сохранить рекорды: {e}")
+
+    def _append_log(self, entry):
+        with open(self.log_path, "ab") as f:
+            size = f.tell()
+            if size == 0:
+                f.write(RUN_LOG_HEADER.pack(RUN_LOG_MAGIC, RUN_LOG_VERSION))
+            elif (size - RUN_LOG_HEADER.size) % RUN_LOG_ENTRY.size:
+                # хвост недописанной записи сдвинул бы все следующие
+                f.truncate(size - (size - RUN_LOG_HEADER.size) % RUN_LOG_ENTRY.size)
+            f.write(entry)
+
+    def _write_table(self, table):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(table, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
 
 # ---------------------------
 # Шрифты
 # ---------------------------
-def get_font_artegra(size, bold=False):
+# Поиск путей (resolve_*) можно звать из пула загрузчика, а сами
+# pygame.font.Font — только из главного потока: FreeType не потокобезопасен
+def resolve_font_artegra(bold=False):
     # 1) пробуем TTF/OTF из assets
     candidates = [
         "ArtegraSans.ttf",
@@ -169,32 +482,153 @@ def get_font_artegra(size, bold=False):
     for fname in candidates:
         p = os.path.join(ASSETS_DIR, fname)
         if os.path.exists(p):
-            f = pygame.font.Font(p, size)
-            try:
-                f.set_bold(bold)
-            except:
-                pass
-            return f
+            return p, bold
     # 2) пробуем системный шрифт
-    f = pygame.font.SysFont("artegra sans", size, bold=bold)
+    return resolve_system_font("artegra sans", bold)
+
+def open_font(resolved, size):
+    # resolved — (путь, включать ли set_bold) из resolve_*
+    path, bold = resolved
+    f = pygame.font.Font(path, size)
+    if bold:
+        f.set_bold(True)
     return f
 
+def get_font_artegra(size, bold=False):
+    return open_font(resolve_font_artegra(bold), size)
+
+# Поиск системного шрифта (как в SysFont) сканирует все шрифты системы —
+# на Windows это сотни миллисекунд. Найденные пути кешируются на диске;
+# чтобы пересканировать (например, после установки шрифта), удалите файл
+FONT_CACHE_FILE = "font_cache.json"
+FONT_CACHE_VERSION = 1
+_font_cache = None
+_font_cache_lock = threading.Lock()
+
+def _load_font_cache():
+    global _font_cache
+    if _font_cache is None:
+        _font_cache = {}
+        try:
+            with open(FONT_CACHE_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == FONT_CACHE_VERSION:
+                _font_cache = data.get("fonts", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"[!] Кеш шрифтов повреждён, будет пересоздан: {FONT_CACHE_FILE} ({e})")
+    return _font_cache
+
+def _save_font_cache(cache):
+    tmp = FONT_CACHE_FILE + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": FONT_CACHE_VERSION, "fonts": cache}, f, indent=1)
+        os.replace(tmp, FONT_CACHE_FILE)
+    except OSError as e:
+        print(f"[!] Не удалось сохранить кеш шрифтов: {FONT_CACHE_FILE} ({e})")
+
+def resolve_system_font(names, bold=False):
+    # (путь или None — встроенный шрифт pygame, нужен ли искусственный жирный)
+    key = f"{names}|{int(bold)}"
+    with _font_cache_lock:
+        entry = _load_font_cache().get(key)
+    if entry is not None and (entry["path"] is None or os.path.exists(entry["path"])):
+        return entry["path"], entry["fake_bold"]
+    path = pygame.font.match_font(names, bold=bold)
+    # жирного начертания нет — SysFont в этом случае включает set_bold
+    fake_bold = bold and (path is None or path == pygame.font.match_font(names))
+    with _font_cache_lock:
+        cache = _load_font_cache()
+        cache[key] = {"path": path, "fake_bold": fake_bold}
+        _save_font_cache(cache)
+    return path, fake_bold
+
+def get_system_font(names, size, bold=False):
+    # то же, что pygame.font.SysFont, но с кешем путей
+    return open_font(resolve_system_font(names, bold), size)
+
+# ---------------------------
+# Кеш текста: готовые поверхности (с обводкой — уже сведённые в одну),
+# LRU-вытеснение и атлас глифов для часто меняющихся счётчиков
+# ---------------------------
+TEXT_CACHE_SIZE = 256
+
+class TextCache:
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (font, text, color, outline) -> Surface
+        self.glyphs = {}              # (font, color) -> {символ: Surface}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, color, outline=None):
+        # outline = (цвет, толщина) или None
+        key = (font, text, color, outline)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        if outline is None:
+            surf = font.render(text, True, color)
+        else:
+            surf = self._render_outlined(font, text, color, outline[0], outline[1])
+        self.entries[key] = surf
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return surf
+
+    def _render_outlined(self, font, text, fg, outline_color, outline_w):
+        # Рисуем обводку повторными смещениями, затем — основное белое
+        ts_fg = font.render(text, True, fg)
+        ts_outline = font.render(text, True, outline_color)
+        w, h = ts_fg.get_size()
+        surf = pygame.Surface((w + 2 * outline_w, h + 2 * outline_w), pygame.SRCALPHA)
+        # окружность из смещений
+        for dx in range(-outline_w, outline_w + 1):
+            for dy in range(-outline_w, outline_w + 1):
+                if dx*dx + dy*dy <= outline_w * outline_w:
+                    surf.blit(ts_outline, (outline_w + dx, outline_w + dy))
+        surf.blit(ts_fg, (outline_w, outline_w))
+        return surf
+
+    def glyph(self, font, ch, color):
+        atlas = self.glyphs.get((font, color))
+        if atlas is None:
+            atlas = self.glyphs[(font, color)] = {}
+        surf = atlas.get(ch)
+        if surf is None:
+            surf = atlas[ch] = font.render(ch, True, color)
+        return surf
+
+    def draw_glyphs(self, surface, font, text, color, pos):
+        # Строка из закешированных глифов: цифры счётчиков не растеризуются
+        # заново при каждом изменении числа
+        x, y = pos
+        for ch in text:
+            g = self.glyph(font, ch, color)
+            surface.blit(g, (x, y))
+            x += g.get_width()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "cached": len(self.entries), "glyphs": sum(len(a) for a in self.glyphs.values())}
+
+TEXT_CACHE = TextCache()
+
+def draw_text(surface, text, font, center_pos, color=WHITE):
+    ts = TEXT_CACHE.render(font, text, color)
+    surface.blit(ts, ts.get_rect(center=center_pos))
+
 def draw_outlined_text(surface, text, font, center_pos, fg=WHITE, outline_color=BLACK, outline_w=2):
-    # Рисуем обводку повторными смещениями, затем — основное белое
-    ts_fg = font.render(text, True, fg)
-    ts_outline = font.render(text, True, outline_color)
-    cx, cy = center_pos
-    rect_fg = ts_fg.get_rect(center=(cx, cy))
-    rect_outline = ts_outline.get_rect(center=(cx, cy))
-    # окружность из смещений
-    for dx in range(-outline_w, outline_w + 1):
-        for dy in range(-outline_w, outline_w + 1):
-            if dx*dx + dy*dy <= outline_w * outline_w:
-                r = rect_outline.copy()
-                r.x += dx
-                r.y += dy
-                surface.blit(ts_outline, r)
-    surface.blit(ts_fg, rect_fg)
+    # обводка симметрична, поэтому центр сведённой поверхности = центр текста
+    ts = TEXT_CACHE.render(font, text, fg, (outline_color, outline_w))
+    surface.blit(ts, ts.get_rect(center=center_pos))
 
 # ---------------------------
 # Шум для холмов
@@ -213,6 +647,20 @@ def rand01_from_i(i, seed):
 def smoothstep(t):
     return t * t * (3 - 2 * t)
 
+# Векторные версии тех же функций (NumPy). Операции и их порядок совпадают
+# со скалярными, поэтому результат бит-в-бит такой же. int64 хватает:
+# i + 374761393 * seed < 2**42, а произведение после маски < 2**62
+def _hash_u32_array(n):
+    n = (n ^ 61) ^ (n >> 16)
+    n = (n + (n << 3)) & 0xFFFFFFFF
+    n = n ^ (n >> 4)
+    n = (n * 0x27d4eb2d) & 0xFFFFFFFF
+    n = n ^ (n >> 15)
+    return n
+
+def rand01_from_i_array(i, seed):
+    return _hash_u32_array(i + 374761393 * seed).astype(np.float64) / 0xFFFFFFFF
+
 class FractalNoise1D:
     def __init__(self, seed=1, octaves=4, persistence=0.5, base_freq=1/220.0):
         self.seed = seed
@@ -228,6 +676,14 @@ class FractalNoise1D:
         v1 = rand01_from_i(i1, self.seed + octave * 101)
         return v0 * (1 - t) + v1 * t
 
+    def value_noise_array(self, xs, octave):
+        i0 = np.floor(xs).astype(np.int64)
+        i1 = i0 + 1
+        t = smoothstep(xs - i0)
+        v0 = rand01_from_i_array(i0, self.seed + octave * 101)
+        v1 = rand01_from_i_array(i1, self.seed + octave * 101)
+        return v0 * (1 - t) + v1 * t
+
     def noise(self, x):
         amp = 1.0
         freq = 1.0
@@ -241,22 +697,95 @@ class FractalNoise1D:
             freq *= 2.0
         return total / max(1e-6, norm)
 
+    def noise_array(self, xs):
+        # то же, что noise(), но для массива координат за один проход
+        xs = np.asarray(xs, dtype=np.float64)
+        amp = 1.0
+        freq = 1.0
+        total = np.zeros_like(xs)
+        norm = 0.0
+        for o in range(self.octaves):
+            n = self.value_noise_array(xs * freq, o)
+            total += n * amp
+            norm += amp
+            amp *= self.persistence
+            freq *= 2.0
+        return total / max(1e-6, norm)
+
 # ---------------------------
 # Кеш масштабов деревьев
 # ---------------------------
+def tree_size(tree_scale, scale=1.0):
+    w = max(8, int(TREE_BASE_W * tree_scale * scale))
+    h = max(8, int(TREE_BASE_H * tree_scale * scale))
+    return w, h
+
 class TreeBillboardCache:
-    def __init__(self, images):
+    def __init__(self, images, max_entries=TREE_CACHE_SIZE):
         self.images = images
-        self.cache = {}  # (idx, w, h) -> Surface
+        self.max_entries = max_entries
+        self.cache = OrderedDict()  # (idx, w, h) -> Surface, LRU
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
     def get(self, idx, w, h):
         key = (idx, w, h)
         surf = self.cache.get(key)
         if surf is None:
-            surf = pygame.transform.smoothscale(self.images[idx], (w, h))
+            self.misses += 1
+            scale = pygame.transform.smoothscale if TREE_SMOOTHSCALE else pygame.transform.scale
+            surf = scale(self.images[idx], (w, h))
             self.cache[key] = surf
+            if len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.hits += 1
+            self.cache.move_to_end(key)
         return surf
 
+    def prewarm(self, scale=1.0):
+        # все варианты x все квантованные масштабы — до первого кадра
+        for idx, w, h in self.prewarm_keys(scale):
+            self.get(idx, w, h)
+
+    def prewarm_keys(self, scale=1.0):
+        return [(idx, *tree_size(q * 0.05, scale)) for idx in range(len(self.images)) for q in TREE_SCALE_STEPS]
+
+    def add(self, idx, w, h, surf):
+        # уже отмасштабированный билборд (из пакета ассетов) — без smoothscale
+        self.cache[(idx, w, h)] = surf
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "cached": len(self.cache)}
+
+# ---------------------------
+# Таблица расстановки деревьев: (вариант, масштаб) для индекса k
+# считается один раз, а не сидированием Random на каждый кадр
+# ---------------------------
+class TreePlacementTable:
+    def __init__(self, variants):
+        self.variants = variants
+        self.table = {}  # k -> (idx, tree_scale)
+
+    def get(self, k):
+        entry = self.table.get(k)
+        if entry is None:
+            rng = random.Random(1000 + k * 7919)
+            idx = rng.randrange(self.variants)
+            tree_scale = round(rng.uniform(0.85, 1.20) / 0.05) * 0.05
+            entry = self.table[k] = (idx, tree_scale)
+        return entry
+
+    def prune(self, k_min):
+        # прокрутка идёт только вправо — индексы левее уже не понадобятся
+        for k in [k for k in self.table if k < k_min]:
+            del self.table[k]
+
 # ---------------------------
 # Слои холмов
 # ---------------------------
@@ -266,97 +795,238 @@ class HillNoiseLayer:
         self.amp = amplitude
         self.speed = SCROLL_SPEED * speed_scale
         self.offset = 0.0
+        self.prev_offset = 0.0  # смещение на предыдущем шаге — для интерполяции
         self.y_bottom = band_bottom_y
         self.y_top_limit = SKY_H
         self.noise = FractalNoise1D(seed=seed, octaves=4, persistence=0.55, base_freq=base_freq)
         self.poly_base_y = poly_base_y if poly_base_y is not None else self.y_bottom
-        self.cached_heights = [self.y_bottom] * (WIDTH + 1)
 
-    def get_height_at(self, x):
+        # Кольцевой буфер высот в мировых координатах: колонка wx лежит в
+        # ячейке wx % ring_cap. Валидны колонки [ring_lo, ring_hi)
+        self.ring_cap = 2 * (WIDTH + 2)
+        self.ring = np.zeros(self.ring_cap) if np is not None else [0.0] * self.ring_cap
+        self.ring_lo = 0
+        self.ring_hi = 0
+        self.ring_step = None
+        self.columns_computed = 0  # сколько колонок шума посчитано всего
+
+        # Полосы слоя: индекс c -> Surface c мировыми x [c*STRIP_CHUNK_W, (c+1)*STRIP_CHUNK_W).
+        # Верх полосы — с запасом над холмами под кроны деревьев
+        self.tree_cache = None
+        self.tree_table = None
+        self.strip_top = max(0, SKY_H - TREE_BASE_H * 2)
+        self.chunks = {}
+        self.chunk_lo = None
+        self.chunk_scale = None
+        self.chunk_trees = False  # рисовались ли деревья в текущих полосах
+        self.chunks_rendered = 0
+        self._spare_chunks = []
+
+    def get_world_height(self, wx):
         base = self.y_bottom - self.amp * 0.6
-        n = self.noise.noise((x + self.offset) * self.noise.base_freq)
+        n = self.noise.noise(wx * self.noise.base_freq)
         y = base - (n - 0.5) * 2.0 * self.amp
         y = max(self.y_top_limit, min(self.y_bottom, y))
         return y
 
+    def world_heights_array(self, wxs):
+        base = self.y_bottom - self.amp * 0.6
+        n = self.noise.noise_array(np.asarray(wxs) * self.noise.base_freq)
+        y = base - (n - 0.5) * 2.0 * self.amp
+        return np.maximum(self.y_top_limit, np.minimum(self.y_bottom, y))
+
     def update(self):
+        self.prev_offset = self.offset
         self.offset += self.speed
 
-    def precompute(self):
+    def ensure_columns(self, lo, hi):
+        # Досчитывает только колонки, которые ещё не в буфере. При обычной
+        # прокрутке это несколько колонок справа за кадр
         step = max(1, int(HILL_SAMPLE_STEP))
-        prev_y = self.get_height_at(0)
-        self.cached_heights[0] = prev_y
-        for x in range(step, WIDTH + 1, step):
-            y = self.get_height_at(x)
-            x0 = x - step
-            dy = (y - prev_y) / step
-            for xi in range(x0 + 1, x + 1):
-                self.cached_heights[xi] = prev_y + dy * (xi - x0)
-            prev_y = y
-
-    def draw(self, surf):
-        points = [(x, self.cached_heights[x]) for x in range(WIDTH + 1)]
-        points.append((WIDTH, self.poly_base_y))
-        points.append((0, self.poly_base_y))
-        pygame.draw.polygon(surf, self.color, points)
-
-    def draw_trees_billboards(self, surf, tree_cache):
+        if step != self.ring_step or lo < self.ring_lo or lo > self.ring_hi:
+            self.ring_step = step
+            self.ring_lo = self.ring_hi = lo
+        if hi <= self.ring_hi:
+            return
+        a = self.ring_hi
+        if np is not None:
+            self._fill_columns_array(a, hi, step)
+        else:
+            self._fill_columns(a, hi, step)
+        self.columns_computed += hi - a
+        self.ring_hi = hi
+        self.ring_lo = max(self.ring_lo, hi - self.ring_cap)
+
+    def _fill_columns(self, a, b, step):
+        # опорные точки шума — на мировой сетке с шагом step, между ними линейно
+        k = a // step
+        x0 = k * step
+        prev_y = self.get_world_height(x0)
+        y = self.get_world_height(x0 + step)
+        for wx in range(a, b):
+            if wx - x0 >= step:
+                k += 1
+                x0 = k * step
+                prev_y = y
+                y = self.get_world_height(x0 + step)
+            self.ring[wx % self.ring_cap] = prev_y + (y - prev_y) / step * (wx - x0)
+
+    def _fill_columns_array(self, a, b, step):
+        k0 = a // step
+        ks = np.arange(k0, (b - 1) // step + 2)
+        ys = self.world_heights_array(ks * step)
+        cols = np.arange(a, b)
+        seg = cols // step - k0
+        prev = ys[seg]
+        dy = (ys[seg + 1] - prev) / step
+        self.ring[cols % self.ring_cap] = prev + dy * (cols - (seg + k0) * step)
+
+    def column_height(self, wx):
+        if self.ring_lo <= wx < self.ring_hi:
+            return self.ring[wx % self.ring_cap]
+        return self.get_world_height(wx)
+
+    def column_heights(self, wx0, n):
+        # n подряд идущих колонок из буфера (должны быть досчитаны)
+        if np is not None:
+            return self.ring[(wx0 + np.arange(n)) % self.ring_cap].tolist()
+        return [self.ring[(wx0 + x) % self.ring_cap] for x in range(n)]
+
+    def draw(self, surf, alpha=1.0):
+        # Кадр = 1–2 blit готовых полос; новая полоса рисуется только когда
+        # прокрутка до неё дошла. Масштаб берётся из ширины surf: полосы
+        # рисуются сразу в разрешении холста (см. NATIVE_LOWRES).
+        # alpha — доля шага симуляции между прошлым и текущим состоянием
+        offset = self.prev_offset + (self.offset - self.prev_offset) * alpha
+        scale = surf.get_width() / WIDTH
+        trees = TREES_ENABLED and bool(self.tree_cache)
+        if scale != self.chunk_scale:
+            self.chunks.clear()
+            self._spare_chunks.clear()
+            self.chunk_lo = None
+            self.chunk_scale = scale
+        if trees != self.chunk_trees:
+            # полосы того же размера — буферы идут в запас
+            self._spare_chunks.extend(self.chunks.values())
+            self.chunks.clear()
+            self.chunk_trees = trees
+        cw = max(1, round(STRIP_CHUNK_W * scale))
+        ox = math.floor(offset * scale)
+        c_lo = ox // cw
+        c_hi = (ox + surf.get_width() - 1) // cw
+        if c_lo != self.chunk_lo:
+            for c in list(self.chunks):
+                if c < c_lo:
+                    self._spare_chunks.append(self.chunks.pop(c))
+            self.chunk_lo = c_lo
+        top = round(self.strip_top * scale)
+        for c in range(c_lo, c_hi + 1):
+            surf.blit(self._chunk_surface(c, cw, scale), (c * cw - ox, top))
+
+    def _chunk_surface(self, c, cw, scale):
+        chunk = self.chunks.get(c)
+        if chunk is None:
+            if self._spare_chunks:
+                chunk = self._spare_chunks.pop()
+                chunk.fill((0, 0, 0, 0))
+            else:
+                h = max(1, round((self.poly_base_y - self.strip_top) * scale))
+                chunk = pygame.Surface((cw, h), pygame.SRCALPHA)
+            self._render_chunk(chunk, c, cw, scale)
+            self.chunks[c] = chunk
+            self.chunks_rendered += 1
+        return chunk
+
+    def _render_chunk(self, chunk, c, cw, scale):
+        # px — колонка холста, мировая колонка под ней = px / scale
+        px0 = c * cw
+        wx0 = int(px0 / scale)
+        wx1 = int((px0 + cw) / scale)
+        top = self.strip_top
+        self.ensure_columns(wx0 - TREE_MARGIN, wx1 + TREE_MARGIN + 1)
+        if scale == 1.0:
+            heights = self.column_heights(wx0, cw + 1)
+        elif np is not None:
+            # колонки досчитаны ensure_columns выше — берём их из буфера разом
+            cols = ((px0 + np.arange(cw + 1)) / scale).astype(np.int64)
+            heights = self.ring[cols % self.ring_cap].tolist()
+        else:
+            heights = [self.column_height(int((px0 + px) / scale)) for px in range(cw + 1)]
+        points = [(px, (y - top) * scale) for px, y in enumerate(heights)]
+        base = (self.poly_base_y - top) * scale
+        points.append((cw, base))
+        points.append((0, base))
+        pygame.draw.polygon(chunk, self.color, points)
+        if self.chunk_trees:
+            self.draw_trees_billboards(chunk, self.tree_cache, wx0, top, scale)
+
+    def draw_trees_billboards(self, surf, tree_cache, wx0, top, scale=1.0):
+        # surf — полоса, чей левый край в мире = wx0, верх на экране = top
         if not tree_cache or not tree_cache.images:
             return
-        scroll = self.offset
+        if self.tree_table is None or self.tree_table.variants != len(tree_cache.images):
+            self.tree_table = TreePlacementTable(len(tree_cache.images))
         spacing = TREE_SPACING
-        start_idx = math.floor((scroll - WIDTH) / spacing)
-        end_idx = math.floor((scroll + WIDTH * 2) / spacing)
+        # только индексы, чьи деревья задевают полосу
+        start_idx = math.ceil((wx0 - TREE_MARGIN) / spacing)
+        end_idx = math.floor((wx0 + surf.get_width() / scale + TREE_MARGIN) / spacing)
+        self.tree_table.prune(start_idx)
         for k in range(start_idx, end_idx + 1):
-            screen_x = int(k * spacing - scroll)
-            if screen_x < -spacing or screen_x > WIDTH + spacing:
-                continue
-            rng = random.Random(1000 + k * 7919)
-            idx = rng.randrange(len(tree_cache.images))
-            scale = round(rng.uniform(0.85, 1.20) / 0.05) * 0.05
-            w = max(8, int(TREE_BASE_W * scale))
-            h = max(8, int(TREE_BASE_H * scale))
-            img_scaled = tree_cache.get(idx, w, h)
-            x_clamped = max(0, min(WIDTH, screen_x))
-            ground_y = int(self.cached_heights[x_clamped])
+            idx, tree_scale = self.tree_table.get(k)
+            img_scaled = tree_cache.get(idx, *tree_size(tree_scale, scale))
+            wx = k * spacing
+            ground_y = int(self.column_height(wx))
             rect = img_scaled.get_rect()
-            rect.midbottom = (screen_x, ground_y + TREE_Y_OFFSET)
+            rect.midbottom = (round((wx - wx0) * scale), round((ground_y + TREE_Y_OFFSET - top) * scale))
             surf.blit(img_scaled, rect)
 
 # ---------------------------
 # Фон: небо, холмы, земля
 # ---------------------------
 class Cloud:
-    def __init__(self):
-        self.w = random.randint(70, 110)
-        self.h = random.randint(35, 55)
-        self.x = WIDTH + random.randint(0, CLOUD_SPAWN_OFFSET_MAX)
-        self.y = random.randint(10, max(10, SKY_H - self.h - 10))
-        self.speed = random.uniform(0.8, 1.3)
+    __slots__ = ("w", "h", "x", "prev_x", "y", "speed", "lobes", "rect")
+
+    def __init__(self, rng=random):
         self.lobes = []
-        for _ in range(random.randint(3, 4)):
-            lw = int(self.w * random.uniform(0.35, 0.6))
-            lh = int(self.h * random.uniform(0.5, 0.9))
-            ox = random.randint(-self.w // 4, self.w // 4)
-            oy = random.randint(-self.h // 5, self.h // 5)
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.reset(rng)
+
+    def reset(self, rng=random):
+        self.w = rng.randint(70, 110)
+        self.h = rng.randint(35, 55)
+        self.x = WIDTH + rng.randint(0, CLOUD_SPAWN_OFFSET_MAX)
+        self.prev_x = self.x
+        self.y = rng.randint(10, max(10, SKY_H - self.h - 10))
+        self.speed = rng.uniform(0.8, 1.3)
+        self.lobes.clear()
+        for _ in range(rng.randint(3, 4)):
+            lw = int(self.w * rng.uniform(0.35, 0.6))
+            lh = int(self.h * rng.uniform(0.5, 0.9))
+            ox = rng.randint(-self.w // 4, self.w // 4)
+            oy = rng.randint(-self.h // 5, self.h // 5)
             self.lobes.append((ox, oy, lw, lh))
 
     def update(self):
+        self.prev_x = self.x
         self.x -= self.speed
         return self.x + self.w < 0
 
-    def draw(self, surf):
-        rect = pygame.Rect(self.x, self.y, self.w, self.h)
-        pygame.draw.ellipse(surf, CLOUD_COLOR, rect)
+    def draw(self, surf, scale=1.0, alpha=1.0):
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        r = self.rect
+        r.update(x * scale, self.y * scale, self.w * scale, self.h * scale)
+        pygame.draw.ellipse(surf, CLOUD_COLOR, r)
         for ox, oy, lw, lh in self.lobes:
-            r = pygame.Rect(self.x + ox, self.y + oy, lw, lh)
+            r.update((x + ox) * scale, (self.y + oy) * scale, lw * scale, lh * scale)
             pygame.draw.ellipse(surf, CLOUD_COLOR, r)
 
 class Background:
-    def __init__(self, tree_images):
+    def __init__(self, tree_images, tree_cache=None, rng=random):
         self.sun_pos = (WIDTH - 120, SKY_H // 2)
         self.sun_r = 30
-        self.clouds = [Cloud() for _ in range(CLOUD_COUNT)]
+        self.rng = rng  # облака; холмы и деревья задаются своими seed шума
+        self.cloud_pool = EntityPool()
+        self.clouds = [self.cloud_pool.acquire(Cloud, rng) for _ in range(CLOUD_COUNT)]
         self.hills_far = HillNoiseLayer(
             HILL_FAR_COLOR,
             amplitude=28,
@@ -375,53 +1045,77 @@ class Background:
             base_freq=1/330.0,
             poly_base_y=GROUND_TOP
         )
-        self.tree_cache = TreeBillboardCache(tree_images) if tree_images else None
+        if tree_cache is None and tree_images:
+            tree_cache = TreeBillboardCache(tree_images)
+        self.tree_cache = tree_cache
+        self.hills_near.tree_cache = self.tree_cache
 
     def update(self):
         self.hills_far.update()
         self.hills_near.update()
-        for c in self.clouds[:]:
-            if c.update():
-                self.clouds.remove(c)
+        update_swap_remove(self.clouds, self.cloud_pool)
         while len(self.clouds) < CLOUD_COUNT:
-            self.clouds.append(Cloud())
+            self.clouds.append(self.cloud_pool.acquire(Cloud, self.rng))
 
     def draw_to_surface(self, surf):
+        self.draw_sky(surf)
+        self.draw_scene(surf)
+
+    # Масштаб отрисовки фона = ширина surf / WIDTH: тот же код рисует и
+    # в полный кадр, и в уменьшенный холст NATIVE_LOWRES
+    def draw_sky(self, surf):
+        # статичная часть: не меняется между кадрами, Compositor кеширует её
+        scale = surf.get_width() / WIDTH
+        sun_pos = (round(self.sun_pos[0] * scale), round(self.sun_pos[1] * scale))
         surf.fill(SKY_COLOR)
-        pygame.draw.circle(surf, SUN_COLOR, self.sun_pos, self.sun_r)
-        pygame.draw.circle(surf, (255, 240, 160), self.sun_pos, self.sun_r + 6, 3)
+        pygame.draw.circle(surf, SUN_COLOR, sun_pos, round(self.sun_r * scale))
+        pygame.draw.circle(surf, (255, 240, 160), sun_pos, round((self.sun_r + 6) * scale), max(1, round(3 * scale)))
+
+    def draw_scene(self, surf, alpha=1.0):
+        scale = surf.get_width() / WIDTH
         for c in self.clouds:
-            c.draw(surf)
-        self.hills_far.precompute()
-        self.hills_near.precompute()
-        self.hills_far.draw(surf)
-        self.hills_near.draw(surf)
-        if self.tree_cache:
-            self.hills_near.draw_trees_billboards(surf, self.tree_cache)
-        pygame.draw.rect(surf, GROUND_COLOR, (0, HEIGHT - GROUND_H, WIDTH, GROUND_H))
+            c.draw(surf, scale, alpha)
+        self.hills_far.draw(surf, alpha)
+        self.hills_near.draw(surf, alpha)  # деревья уже внутри полос ближнего слоя
+        ground_top = round(GROUND_TOP * scale)
+        pygame.draw.rect(surf, GROUND_COLOR, (0, ground_top, surf.get_width(), surf.get_height() - ground_top))
 
 # ---------------------------
 # Декор: папоротники
 # ---------------------------
+FERN_SPAWN_MIN, FERN_SPAWN_MAX = 14, 30  # шагов между папоротниками
+
 class Fern:
-    def __init__(self):
+    __slots__ = ("base_y", "x", "prev_x", "speed", "scale", "height", "leaf_count",
+                 "leaf_span", "stroke", "sway_phase")
+
+    def __init__(self, rng=random):
+        self.reset(rng)
+
+    def reset(self, rng=random):
         self.base_y = HEIGHT - 1
-        self.x = WIDTH + random.randint(0, 160)
+        self.x = WIDTH + rng.randint(0, 160)
+        self.prev_x = self.x
         self.speed = SCROLL_SPEED
-        self.scale = random.uniform(0.9, 1.3)
+        self.scale = rng.uniform(0.9, 1.3)
         self.height = int(46 * self.scale)
-        self.leaf_count = random.randint(6, 8)
+        self.leaf_count = rng.randint(6, 8)
         self.leaf_span = int(16 * self.scale)
         self.stroke = max(2, int(2 * self.scale))
-        self.sway_phase = random.uniform(0, math.tau)
+        self.sway_phase = rng.uniform(0, math.tau)
 
     def update(self, dt):
+        self.prev_x = self.x
         self.x -= self.speed
         self.sway_phase += dt * 1.0
         return self.x + self.leaf_span < 0
 
-    def draw(self, surf):
-        base_x = int(self.x)
+    def draw(self, surf, scale=1.0, alpha=1.0):
+        x = self.prev_x + (self.x - self.prev_x) * alpha
+        if scale != 1.0:
+            self._draw_scaled(surf, scale, x)
+            return
+        base_x = int(x)
         base_y = self.base_y
         stem_top = (base_x, base_y - self.height)
         pygame.draw.line(surf, FERN_COLOR, (base_x, base_y), stem_top, self.stroke)
@@ -438,25 +1132,46 @@ class Fern:
             p2 = (base_x, y - max(2, self.stroke))
             pygame.draw.polygon(surf, FERN_COLOR, (p0, p1, p2), self.stroke)
 
+    def _draw_scaled(self, surf, scale, x):
+        # та же геометрия, пересчитанная в пиксели холста
+        base_x = x * scale
+        base_y = (self.base_y + 1) * scale - 1
+        stroke = max(1, round(self.stroke * scale))
+        height = self.height * scale
+        pygame.draw.line(surf, FERN_COLOR, (base_x, base_y), (base_x, base_y - height), stroke)
+        for i in range(1, self.leaf_count + 1):
+            t = i / (self.leaf_count + 1)
+            y = base_y - height * t
+            leaf_len = self.leaf_span * (0.35 + 0.65 * (1 - t))
+            side = -1 if i % 2 == 0 else 1
+            sway = math.sin(self.sway_phase + t * 3.0) * 3
+            dx = side * (leaf_len + sway) * scale
+            dy = -leaf_len * 0.25 * scale
+            p0 = (base_x, y)
+            p1 = (base_x + dx, y + dy)
+            p2 = (base_x, y - max(2, self.stroke) * scale)
+            pygame.draw.polygon(surf, FERN_COLOR, (p0, p1, p2), stroke)
+
 class FernManager:
-    def __init__(self):
+    def __init__(self, rng=random):
+        self.rng = rng
         self.ferns = []
+        self.pool = EntityPool()
         self.timer = 0
-        self.next_spawn = random.randint(12, 24)
+        self.next_spawn = rng.randint(12, 24)
 
     def update(self, dt):
         self.timer += 1
         if self.timer >= self.next_spawn:
-            self.ferns.append(Fern())
+            self.ferns.append(self.pool.acquire(Fern, self.rng))
             self.timer = 0
-            self.next_spawn = random.randint(14, 30)
-        for f in self.ferns[:]:
-            if f.update(dt):
-                self.ferns.remove(f)
+            self.next_spawn = self.rng.randint(FERN_SPAWN_MIN, FERN_SPAWN_MAX)
+        update_swap_remove(self.ferns, self.pool, dt)
 
-    def draw(self, surf):
+    def draw(self, surf, alpha=1.0):
+        scale = surf.get_width() / WIDTH
         for f in self.ferns:
-            f.draw(surf)
+            f.draw(surf, scale, alpha)
 
 # ---------------------------
 # Игрок
@@ -468,12 +1183,12 @@ class Player:
         self.vy = 0.0
         self.ducking = False
 
-        self.image_stand = load_image("spino_stand.png", (SPINO_STAND_W, SPINO_STAND_H))
-        self.image_duck = load_image("spino_duck.png", (SPINO_DUCK_W, SPINO_DUCK_H))
-
-        self.vis_rect = self.image_stand.get_rect()
+        # картинки берутся из SPRITES только при отрисовке — симуляции без
+        # окна они не нужны
+        self.vis_rect = pygame.Rect(0, 0, SPINO_STAND_W, SPINO_STAND_H)
         self.vis_rect.left = self.x
         self.vis_rect.bottom = HEIGHT
+        self.prev_bottom = self.vis_rect.bottom  # для интерполяции рендера
 
         self.rect = pygame.Rect(0, 0, int(SPINO_STAND_W * HITBOX_SCALE), int(SPINO_STAND_H * HITBOX_SCALE))
         self._rebuild_hitbox()
@@ -499,10 +1214,9 @@ class Player:
             return True
         return False
 
-    def update(self, keys):
-        self.ducking = self.on_ground and (
-            keys[pygame.K_s] or keys[pygame.K_DOWN] or keys[pygame.K_RCTRL]
-        )
+    def update(self, duck):
+        self.prev_bottom = self.vis_rect.bottom
+        self.ducking = self.on_ground and duck
         if self.on_ground:
             if self.ducking:
                 self.vis_rect.width, self.vis_rect.height = SPINO_DUCK_W, SPINO_DUCK_H
@@ -523,23 +1237,34 @@ class Player:
 
         self._rebuild_hitbox()
 
-    def draw(self, surface):
-        img = self.image_duck if self.ducking else self.image_stand
-        surface.blit(img, (self.vis_rect.left, self.vis_rect.bottom - img.get_height()))
+    def sprite(self):
+        if self.ducking:
+            return "spino_duck.png", (SPINO_DUCK_W, SPINO_DUCK_H)
+        return "spino_stand.png", (SPINO_STAND_W, SPINO_STAND_H)
+
+    def mask(self):
+        return SPRITES.mask(*self.sprite())
+
+    def draw(self, surface, alpha=1.0):
+        img = SPRITES.get(*self.sprite())
+        bottom = self.prev_bottom + (self.vis_rect.bottom - self.prev_bottom) * alpha
+        surface.blit(img, (self.vis_rect.left, round(bottom) - img.get_height()))
 
 # ---------------------------
 # Препятствия
 # ---------------------------
 class Obstacle:
+    # Экземпляры живут в EntityPool: конструктор создаёт Rect-ы один раз,
+    # reset() в подклассах только переставляет их в точку спавна
+    __slots__ = ("sprite", "vis_rect", "rect", "prev_x")
+
     def __init__(self, image, w, h, hitbox_scale=HITBOX_SCALE):
-        self.image = load_image(image, (w, h))
-        self.vis_rect = self.image.get_rect()
-        self.vis_rect.left = WIDTH
+        self.sprite = image  # имя в SPRITES; сама Surface нужна только для draw()
+        self.vis_rect = pygame.Rect(0, 0, w, h)
 
         hit_w = int(w * hitbox_scale)
         hit_h = int(h * hitbox_scale)
         self.rect = pygame.Rect(0, 0, hit_w, hit_h)
-        self.rect.center = self.vis_rect.center
 
     def _anchor_bottom(self):
         self.rect.centerx = self.vis_rect.centerx
@@ -550,36 +1275,64 @@ class Obstacle:
         self.rect.top = self.vis_rect.top
 
     def update(self):
+        self.prev_x = self.vis_rect.x
         self.vis_rect.x -= SCROLL_SPEED
         self.rect.x -= SCROLL_SPEED
 
-    def draw(self, surface):
-        surface.blit(self.image, self.vis_rect)
+    def mask(self):
+        return SPRITES.mask(self.sprite, self.vis_rect.size)
+
+    def draw(self, surface, alpha=1.0):
+        x = self.prev_x + (self.vis_rect.x - self.prev_x) * alpha
+        surface.blit(SPRITES.get(self.sprite, self.vis_rect.size), (round(x), self.vis_rect.y))
 
     def is_offscreen(self):
         return self.vis_rect.right < 0
 
 class Cactus(Obstacle):
-    def __init__(self):
+    __slots__ = ()
+    KIND = 0
+
+    def __init__(self, rng=random):
         super().__init__("cactus.png", CACTUS_W, CACTUS_H)
+        self.reset(rng)
+
+    def reset(self, rng=random):
+        self.vis_rect.left = WIDTH
         self.vis_rect.bottom = HEIGHT
+        self.prev_x = WIDTH
         self._anchor_bottom()
 
+def pteranodon_band():
+    # Диапазон низа птеранодона: выше хитбокса стоящего игрока, но с зазором
+    # SAFE_GAP над пригнувшимся. Если диапазон пуст (min > max) — берётся
+    # запасная высота посередине
+    stand_hit_top = HEIGHT - int(SPINO_STAND_H * HITBOX_SCALE)
+    duck_hit_top  = HEIGHT - int(SPINO_DUCK_H  * HITBOX_SCALE)
+    margin = 8
+    min_bottom = stand_hit_top + margin
+    max_bottom = duck_hit_top - SAFE_GAP
+    min_bottom = max(min_bottom, PTERA_H)
+    max_bottom = min(max_bottom, HEIGHT)
+    return min_bottom, max_bottom, (stand_hit_top + duck_hit_top) // 2
+
 class Pteranodon(Obstacle):
-    def __init__(self):
+    __slots__ = ()
+    KIND = 1
+
+    def __init__(self, rng=random):
         super().__init__("pteranodon.png", PTERA_W, PTERA_H)
-        stand_hit_top = HEIGHT - int(SPINO_STAND_H * HITBOX_SCALE)
-        duck_hit_top  = HEIGHT - int(SPINO_DUCK_H  * HITBOX_SCALE)
-        margin = 8
-        min_bottom = stand_hit_top + margin
-        max_bottom = duck_hit_top - SAFE_GAP
-        min_bottom = max(min_bottom, PTERA_H)
-        max_bottom = min(max_bottom, HEIGHT)
+        self.reset(rng)
+
+    def reset(self, rng=random):
+        min_bottom, max_bottom, fallback_bottom = pteranodon_band()
         if min_bottom > max_bottom:
-            target_bottom = (stand_hit_top + duck_hit_top) // 2
+            target_bottom = fallback_bottom
         else:
-            target_bottom = random.randint(min_bottom, max_bottom)
+            target_bottom = rng.randint(min_bottom, max_bottom)
+        self.vis_rect.left = WIDTH
         self.vis_rect.bottom = target_bottom
+        self.prev_x = WIDTH
         self._anchor_bottom()
 
 # ---------------------------
@@ -596,41 +1349,62 @@ class Button:
         self.border_color = border_color
         self.border_width = border_width
         self.padding = padding
+        self.hover = False  # обновляется раз в кадр из menu_navigation
+
+        # Готовые спрайты состояний: "normal" / "hover" / "selected"
+        self.sprites = None
+        self._sprites_key = None
 
         if self.rect.w == 0 or self.rect.h == 0:
-            surf = self.font.render(self.text, True, self.text_color)
-            self.rect.size = (surf.get_width() + 2*self.padding, surf.get_height() + 2*self.padding)
+            tw, th = self.font.size(self.text)
+            self.rect.size = (tw + 2*self.padding, th + 2*self.padding)
 
     def is_hover(self):
-        return self.rect.collidepoint(pygame.mouse.get_pos())
+        return self.hover
 
-    def draw(self, surface, selected=False):
-        mouse_hover = self.is_hover()
+    def update_hover(self, mouse_pos):
+        self.hover = self.rect.collidepoint(mouse_pos)
+        return self.hover
+
+    def _state_style(self, state):
         base = self.bg_color
         hov  = self.hover_color
-        if selected:
+        if state == "selected":
             # усиленная подсветка выбранной кнопки
             if len(hov) == 4:
                 color = (hov[0], hov[1], hov[2], min(255, hov[3] + 40))
             else:
                 color = hov
-            bw = max(3, self.border_width + 1)
-        elif mouse_hover:
-            color = hov
-            bw = self.border_width
-        else:
-            color = base
-            bw = self.border_width
+            return color, max(3, self.border_width + 1)
+        if state == "hover":
+            return hov, self.border_width
+        return base, self.border_width
 
-        if len(color) == 4 or color != (0,0,0,0):
+    def _build_sprites(self):
+        ts = self.font.render(self.text, True, self.text_color)
+        self.sprites = {}
+        for state in ("normal", "hover", "selected"):
+            color, bw = self._state_style(state)
             s = pygame.Surface(self.rect.size, pygame.SRCALPHA)
-            s.fill(color)
-            surface.blit(s, self.rect.topleft)
-
-        pygame.draw.rect(surface, self.border_color, self.rect, bw, border_radius=8)
+            if len(color) == 4 or color != (0,0,0,0):
+                s.fill(color)
+            pygame.draw.rect(s, self.border_color, s.get_rect(), bw, border_radius=8)
+            s.blit(ts, ts.get_rect(center=s.get_rect().center))
+            self.sprites[state] = s
 
-        ts = self.font.render(self.text, True, self.text_color)
-        surface.blit(ts, ts.get_rect(center=self.rect.center))
+    def draw(self, surface, selected=False):
+        # пересобираем спрайты только если поменялись текст, шрифт или размер
+        key = (self.text, self.font, self.rect.size)
+        if key != self._sprites_key:
+            self._build_sprites()
+            self._sprites_key = key
+        if selected:
+            state = "selected"
+        elif self.hover:
+            state = "hover"
+        else:
+            state = "normal"
+        surface.blit(self.sprites[state], self.rect.topleft)
 
     def is_clicked(self, event_list):
         for e in event_list:
@@ -642,7 +1416,7 @@ class Button:
 # ---------------------------
 # Меню-навигация (стрелки/мышь) + флаг смены выделения (для hover-озвучки)
 # ---------------------------
-def menu_navigation(buttons, selected_idx, events):
+def menu_navigation(buttons, selected_idx, events, mouse_pos=None):
     prev_idx = selected_idx
     activated = None
     changed = False
@@ -658,9 +1432,10 @@ def menu_navigation(buttons, selected_idx, events):
             elif e.key in (pygame.K_RETURN, pygame.K_SPACE):
                 activated = selected_idx
 
-    mouse_pos = pygame.mouse.get_pos()
+    if mouse_pos is None:
+        mouse_pos = pygame.mouse.get_pos()
     for i, b in enumerate(buttons):
-        if b.rect.collidepoint(mouse_pos) and selected_idx != i:
+        if b.update_hover(mouse_pos) and selected_idx != i:
             selected_idx = i
             changed = True
         if b.is_clicked(events):
@@ -670,68 +1445,1144 @@ def menu_navigation(buttons, selected_idx, events):
     return selected_idx, activated, hover_changed
 
 # ---------------------------
-# Создание новой игры (объекты)
+# Профайлер кадра: время по стадиям цикла main(). mark(stage) относит к
+# стадии время с предыдущей отметки. Выключенный профайлер подменяет mark
+# пустой функцией — замеров и записи нет совсем. F3 — оверлей
 # ---------------------------
-def start_new_run(tree_images):
-    game = {}
-    game["player"] = Player()
-    game["obstacles"] = []
-    game["fern_mgr"] = FernManager()
-    game["background"] = Background(tree_images)
-    game["spawn_timer"] = 0
-    game["next_spawn"] = random.randint(50, 95)
-    game["score"] = 0
-    game["distance"] = 0.0
-    game["last_checkpoint_index"] = -1  # для звука "метки"
-    return game
+PROFILE_STAGES = ("wait", "events", "sim", "sky", "hills", "ferns", "scale", "sprites", "ui", "overlay", "flip")
+PROFILE_WINDOW = 120          # кадров в скользящем среднем и гистограмме
+PROFILE_HIST_BIN_MS = 2.0     # ширина столбца гистограммы времени кадра
+PROFILE_HIST_BINS = 17        # последний столбец — всё, что дольше
+
+def _profile_noop(stage):
+    pass
+
+class FrameProfiler:
+    def __init__(self):
+        self.overlay_visible = False
+        self.csv_file = None
+        self.csv_writer = None
+        self.stage_index = {name: i for i, name in enumerate(PROFILE_STAGES)}
+        self.current = [0.0] * len(PROFILE_STAGES)
+        self.history = deque(maxlen=PROFILE_WINDOW)  # (время кадра, стадии) в мс
+        self.frame_index = 0
+        self.last = time.perf_counter()
+        self.averages = None  # пересчитываются не чаще раза в 15 кадров
+        self.mark = _profile_noop
+
+    @property
+    def active(self):
+        return self.overlay_visible or self.csv_writer is not None
+
+    def open_csv(self, path):
+        try:
+            self.csv_file = open(path, "w", newline="", encoding="utf-8")
+        except Exception as e:
+            print(f"[!] Не удалось открыть CSV профайлера: {path} ({e})")
+            return
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(("frame", "state", "frame_ms") + PROFILE_STAGES)
+        self._sync()
+
+    def close(self):
+        if self.csv_file:
+            self.csv_file.close()
+        self.csv_file = None
+        self.csv_writer = None
+        self._sync()
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self._sync()
+
+    def _sync(self):
+        self.mark = self._mark if self.active else _profile_noop
+        self.current = [0.0] * len(PROFILE_STAGES)
+        self.last = time.perf_counter()
+        self.history.clear()
+        self.averages = None
+
+    def _mark(self, stage):
+        now = time.perf_counter()
+        self.current[self.stage_index[stage]] += now - self.last
+        self.last = now
+
+    def end_frame(self, state=""):
+        # время кадра — сумма стадий, включая ожидание в clock.tick ("wait")
+        if not self.active:
+            return
+        stages = [t * 1000.0 for t in self.current]
+        self.current = [0.0] * len(PROFILE_STAGES)
+        frame_ms = sum(stages)
+        self.history.append((frame_ms, stages))
+        if self.csv_writer:
+            self.csv_writer.writerow([self.frame_index, state, f"{frame_ms:.3f}"] + [f"{t:.3f}" for t in stages])
+        self.frame_index += 1
+        if self.averages is None or self.frame_index % 15 == 0:
+            self.averages = self._averages()
+
+    def _averages(self):
+        n = len(self.history)
+        totals = [0.0] * len(PROFILE_STAGES)
+        frame_total = 0.0
+        bins = [0] * PROFILE_HIST_BINS
+        for frame_ms, stages in self.history:
+            frame_total += frame_ms
+            for i, t in enumerate(stages):
+                totals[i] += t
+            bins[min(PROFILE_HIST_BINS - 1, int(frame_ms / PROFILE_HIST_BIN_MS))] += 1
+        return frame_total / n, [t / n for t in totals], bins
+
+    def draw_overlay(self, surface, font, lines=()):
+        # lines — дополнительные строки под гистограммой (звук и т.п.)
+        if not self.overlay_visible or not self.averages:
+            return
+        frame_ms, stages, bins = self.averages
+        x0, y0 = WIDTH - 200, 60
+        panel = pygame.Rect(x0 - 8, y0 - 6, 200, 18 * (len(PROFILE_STAGES) + 1 + len(lines)) + 70)
+        surface.fill((0, 0, 0), panel)
+        fps = 1000.0 / frame_ms if frame_ms > 0 else 0.0
+        TEXT_CACHE.draw_glyphs(surface, font, f"frame {frame_ms:.2f} ms  {fps:.0f} fps", WHITE, (x0, y0))
+        for i, name in enumerate(PROFILE_STAGES):
+            y = y0 + 18 * (i + 1)
+            TEXT_CACHE.draw_glyphs(surface, font, name, WHITE, (x0, y))
+            TEXT_CACHE.draw_glyphs(surface, font, f"{stages[i]:.3f} ms", WHITE, (x0 + 80, y))
+        # гистограмма времени кадра: столбцы по PROFILE_HIST_BIN_MS
+        base_y = y0 + 18 * (len(PROFILE_STAGES) + 1) + 56
+        peak = max(bins) or 1
+        bar_w = (panel.width - 16) // PROFILE_HIST_BINS
+        for i, count in enumerate(bins):
+            h = round(50 * count / peak)
+            if h:
+                color = (90, 200, 90) if (i + 1) * PROFILE_HIST_BIN_MS <= 1000.0 / SIM_HZ else (220, 90, 60)
+                surface.fill(color, (x0 + i * bar_w, base_y - h, bar_w - 1, h))
+        for i, line in enumerate(lines):
+            TEXT_CACHE.draw_glyphs(surface, font, line, WHITE, (x0, base_y + 6 + 18 * i))
+
+PROFILER = FrameProfiler()
+
+# ---------------------------
+# Качество графики. Пресеты — значения констант модуля, от дорогого к
+# дешёвому; первый совпадает с умолчаниями. QualityGovernor следит за
+# скользящим средним времени работы кадра (без ожидания в clock.tick) и
+# сдвигает уровень на шаг: дешевле — когда кадр не влезает в бюджет FPS,
+# дороже — когда запас большой. Уровень, который не потянули, снова
+# пробуется не раньше чем через QUALITY_RETRY_FRAMES кадров, и каждая
+# следующая неудача удваивает паузу — качество не «мигает»
+# ---------------------------
+QUALITY_PRESETS = (
+    ("high",   {"PIXELATE_FACTOR": 2, "HILL_SAMPLE_STEP": 2, "CLOUD_COUNT": 4,
+                "FERN_SPAWN_MIN": 14, "FERN_SPAWN_MAX": 30, "TREES_ENABLED": True, "TREE_SMOOTHSCALE": True}),
+    ("medium", {"PIXELATE_FACTOR": 2, "HILL_SAMPLE_STEP": 4, "CLOUD_COUNT": 3,
+                "FERN_SPAWN_MIN": 20, "FERN_SPAWN_MAX": 40, "TREES_ENABLED": True, "TREE_SMOOTHSCALE": False}),
+    ("low",    {"PIXELATE_FACTOR": 3, "HILL_SAMPLE_STEP": 6, "CLOUD_COUNT": 2,
+                "FERN_SPAWN_MIN": 30, "FERN_SPAWN_MAX": 60, "TREES_ENABLED": True, "TREE_SMOOTHSCALE": False}),
+    ("min",    {"PIXELATE_FACTOR": 4, "HILL_SAMPLE_STEP": 8, "CLOUD_COUNT": 1,
+                "FERN_SPAWN_MIN": 50, "FERN_SPAWN_MAX": 90, "TREES_ENABLED": False, "TREE_SMOOTHSCALE": False}),
+)
+QUALITY_NAMES = tuple(name for name, _ in QUALITY_PRESETS)
+QUALITY_WINDOW = 90          # кадров в скользящем среднем
+QUALITY_DOWN_AT = 0.9        # доля бюджета кадра, выше которой качество снижается
+QUALITY_UP_AT = 0.55         # ... и ниже которой повышается
+QUALITY_RETRY_FRAMES = 600   # пауза перед повтором уровня после первой неудачи
+
+class QualityGovernor:
+    # preset=None — автоматический выбор; иначе уровень зафиксирован.
+    # pinned — константы, заданные из командной строки: их пресеты не трогают
+    def __init__(self, target_fps, preset=None, pinned=()):
+        self.budget_ms = 1000.0 / target_fps
+        self.auto = preset is None
+        self.pinned = set(pinned)
+        self.level = 0 if preset is None else QUALITY_NAMES.index(preset)
+        self.changes = 0
+        self.samples = deque(maxlen=QUALITY_WINDOW)
+        self.total = 0.0
+        self.frame = 0
+        self.retry_at = {}   # уровень -> кадр, раньше которого его не пробуем
+        self.retry_gap = {}  # уровень -> текущая пауза до повтора
+        self.apply(self.level)  # стартовый пресет — не смена: уровень уже равен ему
+
+    @property
+    def name(self):
+        return QUALITY_NAMES[self.level]
+
+    def average_ms(self):
+        return self.total / len(self.samples) if self.samples else 0.0
+
+    def apply(self, level):
+        g = globals()
+        for name, value in QUALITY_PRESETS[level][1].items():
+            if name not in self.pinned:
+                g[name] = value
+        if level != self.level:
+            self.changes += 1
+        self.level = level
+        # кадры прошлого уровня ничего не говорят о новом
+        self.samples.clear()
+        self.total = 0.0
+
+    def update(self, work_ms):
+        self.frame += 1
+        if not self.auto:
+            return
+        if len(self.samples) == self.samples.maxlen:
+            self.total -= self.samples[0]
+        self.samples.append(work_ms)
+        self.total += work_ms
+        if len(self.samples) < self.samples.maxlen:
+            return
+        avg = self.total / len(self.samples)
+        if avg > self.budget_ms * QUALITY_DOWN_AT and self.level + 1 < len(QUALITY_PRESETS):
+            gap = self.retry_gap[self.level] * 2 if self.level in self.retry_gap else QUALITY_RETRY_FRAMES
+            self.retry_gap[self.level] = gap
+            self.retry_at[self.level] = self.frame + gap
+            self.apply(self.level + 1)
+        elif (avg < self.budget_ms * QUALITY_UP_AT and self.level > 0
+              and self.frame >= self.retry_at.get(self.level - 1, 0)):
+            self.apply(self.level - 1)
+
+    def status(self):
+        mode = "auto" if self.auto else "fixed"
+        return f"quality {self.name} ({mode})  work {self.average_ms():.1f}/{self.budget_ms:.1f} ms  changes {self.changes}"
+
+# ---------------------------
+# Композитор кадра: постоянные буферы и кеш неизменных слоёв
+# ---------------------------
+class Compositor:
+    def __init__(self, size=(WIDTH, HEIGHT)):
+        self.size = size
+        self.allocations = 0  # сколько Surface-буферов создано за всё время
+        self.canvas = None     # холст NATIVE_LOWRES
+        self.frame = None      # полноразмерный кадр для пути через pixelate
+        self.pixelated = None
+        self.small = None
+        self.sky = None
+        self.overlays = {}  # alpha -> готовая затемняющая плашка
+        self.snapshot = None    # замороженная сцена (пауза/отсчёт/game over)
+        self.snapshot_key = None
+
+    def _alloc(self, size, flags=pygame.SRCALPHA, like=None):
+        self.allocations += 1
+        if like is not None:
+            return pygame.Surface(size, flags, like)
+        return pygame.Surface(size, flags)
+
+    def sky_layer(self, background, like):
+        size = like.get_size()
+        if self.sky is None or self.sky.get_size() != size:
+            self.sky = self._alloc(size, 0, like)
+            background.draw_sky(self.sky)
+        return self.sky
+
+    def overlay(self, alpha):
+        surf = self.overlays.get(alpha)
+        if surf is None:
+            surf = self._alloc(self.size)
+            surf.fill((0, 0, 0, alpha))
+            self.overlays[alpha] = surf
+        return surf
+
+    def pixelate(self, surface, factor):
+        if factor <= 1:
+            return surface
+        w, h = self.size
+        small_size = (max(1, w // factor), max(1, h // factor))
+        if self.small is None or self.small.get_size() != small_size:
+            self.small = self._alloc(small_size)
+        if self.pixelated is None:
+            self.pixelated = self._alloc(self.size)
+        return pixelate_surface(surface, factor, self.small, self.pixelated)
+
+    def draw_background(self, screen, background, fern_mgr=None, alpha=1.0):
+        factor = max(1, int(PIXELATE_FACTOR))
+        if not NATIVE_LOWRES:
+            self._draw_background_pixelated(screen, background, fern_mgr, factor, alpha)
+            return
+        if factor == 1:
+            # холст совпадает с экраном — рисуем прямо в него
+            canvas = screen
+        else:
+            w, h = self.size
+            size = (max(1, w // factor), max(1, h // factor))
+            if self.canvas is None or self.canvas.get_size() != size:
+                self.canvas = self._alloc(size, 0, screen)
+            canvas = self.canvas
+        # небо непрозрачное и закрывает весь холст, так что очищать его не нужно
+        mark = PROFILER.mark
+        canvas.blit(self.sky_layer(background, canvas), (0, 0))
+        mark("sky")
+        background.draw_scene(canvas, alpha)
+        mark("hills")
+        if fern_mgr:
+            fern_mgr.draw(canvas, alpha)
+            mark("ferns")
+        if canvas is not screen:
+            # одно растяжение «ближайшим соседом» прямо в кадр экрана
+            pygame.transform.scale(canvas, screen.get_size(), screen)
+            mark("scale")
+
+    def _draw_background_pixelated(self, screen, background, fern_mgr, factor, alpha):
+        if self.frame is None:
+            self.frame = self._alloc(self.size, 0, screen)
+        frame = self.frame
+        mark = PROFILER.mark
+        frame.blit(self.sky_layer(background, frame), (0, 0))
+        mark("sky")
+        background.draw_scene(frame, alpha)
+        mark("hills")
+        if fern_mgr:
+            fern_mgr.draw(frame, alpha)
+            mark("ferns")
+        screen.blit(self.pixelate(frame, factor), (0, 0))
+        mark("scale")
+
+    def draw_world(self, screen, game, alpha=1.0):
+        # мир сдвинулся — снимок заморозки больше не актуален
+        self.snapshot_key = None
+        game.render(screen, self, alpha)
+
+    def draw_frozen(self, screen, game, alpha):
+        # Пока игра стоит, сцена не меняется: рисуем её вместе с затемнением
+        # один раз и дальше каждый кадр только копируем снимок
+        key = (id(game), alpha)
+        if self.snapshot_key != key:
+            if self.snapshot is None or self.snapshot.get_size() != screen.get_size():
+                self.snapshot = self._alloc(screen.get_size(), 0, screen)
+            game.render(self.snapshot, self)
+            self.snapshot.blit(self.overlay(alpha), (0, 0))
+            self.snapshot_key = key
+        screen.blit(self.snapshot, (0, 0))
+        PROFILER.mark("scale")
+
+# ---------------------------
+# Окно. Игра и интерфейс рисуются в логический кадр WIDTH x HEIGHT (сцена —
+# в холст WIDTH/PIXELATE_FACTOR, см. Compositor), а в окно любого размера или
+# на весь экран кадр попадает одним растяжением с полосами по краям.
+# Размер окна не влияет ни на какую отрисовку, кроме этого растяжения:
+# при смене размера пересчитывается только его прямоугольник
+# ---------------------------
+class Display:
+    def __init__(self, window_size=None, fullscreen=False):
+        self.windowed_size = window_size or (WIDTH, HEIGHT)
+        self.fullscreen = fullscreen
+        self.window = None
+        self.frame = None   # логический кадр: сюда рисуется всё
+        self.dest = None    # куда кадр ложится в окне
+        self.target = None  # подповерхность окна под dest; None — кадр и есть окно
+        self.layouts = 0    # сколько раз пересчитывалась раскладка
+        self.set_mode()
+
+    def set_mode(self):
+        if self.fullscreen:
+            self.window = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            self.window = pygame.display.set_mode(self.windowed_size, pygame.RESIZABLE)
+        self._layout()
+
+    def _layout(self):
+        ww, wh = self.window.get_size()
+        self.layouts += 1
+        if (ww, wh) == (WIDTH, HEIGHT):
+            # масштаб 1: рисуем прямо в окно, без лишнего копирования
+            self.frame = self.window
+            self.dest = self.window.get_rect()
+            self.target = None
+            return
+        k = min(ww / WIDTH, wh / HEIGHT)
+        self.dest = pygame.Rect(0, 0, max(1, round(WIDTH * k)), max(1, round(HEIGHT * k)))
+        self.dest.center = (ww // 2, wh // 2)
+        if self.frame is None or self.frame is self.window:
+            self.frame = pygame.Surface((WIDTH, HEIGHT)).convert()
+        self.window.fill(BLACK)
+        self.target = self.window.subsurface(self.dest)
+
+    def handle_event(self, event):
+        # True — раскладка поменялась и display.frame мог смениться
+        if event.type == pygame.VIDEORESIZE and not self.fullscreen:
+            self.windowed_size = event.size
+            self.window = pygame.display.get_surface()
+            self._layout()
+            return True
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+            self.fullscreen = not self.fullscreen
+            self.set_mode()
+            return True
+        return False
+
+    def to_logical(self, pos):
+        d = self.dest
+        return ((pos[0] - d.x) * WIDTH // d.w, (pos[1] - d.y) * HEIGHT // d.h)
+
+    def map_events(self, events):
+        # координаты мыши в событиях — в логический кадр (для Button.is_clicked)
+        if self.target is None:
+            return events
+        mapped = []
+        for e in events:
+            if e.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP, pygame.MOUSEMOTION):
+                e = pygame.event.Event(e.type, {**e.dict, "pos": self.to_logical(e.pos)})
+            mapped.append(e)
+        return mapped
+
+    def mouse_pos(self):
+        return self.to_logical(pygame.mouse.get_pos())
+
+    def present(self):
+        if self.target is not None:
+            # единственное растяжение кадра — «ближайшим соседом», как и холст сцены
+            pygame.transform.scale(self.frame, self.dest.size, self.target)
+        pygame.display.flip()
+
+# ---------------------------
+# Игровой движок без окна: reset(seed) / step(action) / render(surface)
+# ---------------------------
+ACTION_NONE = 0
+ACTION_JUMP = 1
+ACTION_DUCK = 2
+
+class GameState:
+    # decor=False — без фона и папоротников: только логика забега, для
+    # прогонов быстрее реального времени. Случайность геймплея — из self.rng,
+    # декора — из отдельного self.decor_rng того же seed: декор не сдвигает
+    # поток геймплея, и забег с decor=False совпадает с обычным
+    def __init__(self, tree_images=None, tree_cache=None, decor=True, collision=None):
+        self.tree_images = tree_images
+        self.tree_cache = tree_cache
+        self.decor = decor
+        self.collision = collision or COLLISION_MODE
+        self.obstacles = deque()  # упорядочены по x: уходят за экран в порядке спавна
+        self.obstacle_pool = EntityPool()
+        self.events = []  # события последнего шага: "jump", "checkpoint", "death"
+        self._compositor = None
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is None:
+            # новый забег без seed всё равно воспроизводим: seed выбирается здесь
+            seed = random.randrange(1 << 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.player = Player()
+        while self.obstacles:
+            self.obstacle_pool.release(self.obstacles.pop())
+        if self.decor:
+            self.decor_rng = random.Random(f"decor:{seed}")
+            self.fern_mgr = FernManager(self.decor_rng)
+            self.background = Background(self.tree_images, self.tree_cache, self.decor_rng)
+        else:
+            self.fern_mgr = None
+            self.background = None
+        self.spawn_timer = 0
+        self.next_spawn = self.rng.randint(SPAWN_FIRST_MIN, SPAWN_FIRST_MAX)
+        self.score = 0
+        self.distance = 0.0
+        self.last_checkpoint_index = -1  # для звука "метки"
+        self.frames = 0
+        self.done = False
+        self.killed_by = None  # KIND препятствия, о которое разбились
+        self.events.clear()
+        return self.observation()
+
+    def step(self, action=ACTION_NONE):
+        # один фиксированный шаг SIM_DT; возвращает (observation, reward, done),
+        # reward — сколько препятствий пройдено за шаг
+        events = self.events
+        events.clear()
+        if self.done:
+            return self.observation(), 0, True
+        player = self.player
+        if action == ACTION_JUMP and player.start_jump():
+            events.append("jump")
+        player.update(action == ACTION_DUCK)
+        self.distance += DISTANCE_SPEED * SIM_DT
+
+        # Чекпоинты (метки)
+        checkpoint_index = int(self.distance // CHECKPOINT_STEP)
+        if checkpoint_index > self.last_checkpoint_index:
+            self.last_checkpoint_index = checkpoint_index
+            if checkpoint_index > 0:
+                events.append("checkpoint")
+
+        if self.decor:
+            self.background.update()
+
+        self.spawn_timer += 1
+        if self.spawn_timer >= self.next_spawn:
+            allow_fliers = self.distance >= PTERA_MIN_DISTANCE
+            if allow_fliers and self.rng.random() < PTERA_CHANCE:
+                self.obstacles.append(self.obstacle_pool.acquire(Pteranodon, self.rng))
+            else:
+                self.obstacles.append(self.obstacle_pool.acquire(Cactus, self.rng))
+            self.spawn_timer = 0
+            self.next_spawn = self.rng.randint(SPAWN_INTERVAL_MIN, SPAWN_INTERVAL_MAX)
+
+        score_before = self.score
+        obstacles = self.obstacles
+        for o in obstacles:
+            o.update()
+        # все едут с одной скоростью — за экран уходят только первые (кольцевой буфер)
+        while obstacles and obstacles[0].is_offscreen():
+            self.obstacle_pool.release(obstacles.popleft())
+            self.score += 1
+
+        if self.decor:
+            self.fern_mgr.update(SIM_DT)
+
+        self.frames += 1
+
+        # Столкновения
+        hit = self.find_collision()
+        if hit is not None:
+            events.append("death")
+            self.done = True
+            self.killed_by = hit.KIND
+        return self.observation(), self.score - score_before, self.done
+
+    def find_collision(self):
+        # Препятствия в деке упорядочены по x, поэтому отбор кандидатов —
+        # «sweep and prune» по картинкам: пропускаем оставшихся позади игрока
+        # и останавливаемся на первом, что целиком правее. Хитбокс и маска
+        # лежат внутри картинки, так что отброшенные столкнуться не могут.
+        # Дорогая проверка масок — только при пересечении прямоугольников
+        player = self.player
+        p_vis = player.vis_rect
+        use_mask = self.collision == "mask"
+        for o in self.obstacles:
+            o_vis = o.vis_rect
+            if o_vis.right <= p_vis.left:
+                continue
+            if o_vis.left >= p_vis.right:
+                break
+            if use_mask:
+                if o_vis.colliderect(p_vis) and player.mask().overlap(
+                        o.mask(), (o_vis.x - p_vis.x, o_vis.y - p_vis.y)):
+                    return o
+            elif o.rect.colliderect(player.rect):
+                return o
+        return None
+
+    def observation(self):
+        # (низ игрока, vy, на земле, пригнулся) + два ближайших препятствия
+        # впереди: (расстояние до хитбокса, вид, верх, низ хитбокса)
+        p = self.player
+        obs = [p.vis_rect.bottom, p.vy, p.on_ground, p.ducking]
+        seen = 0
+        for o in self.obstacles:
+            if o.rect.right < p.rect.left:
+                continue
+            obs += (o.rect.left - p.rect.right, o.KIND, o.rect.top, o.rect.bottom)
+            seen += 1
+            if seen == 2:
+                break
+        for _ in range(2 - seen):
+            obs += (WIDTH, -1, 0, 0)
+        return tuple(obs)
+
+    def render(self, surface, compositor=None, alpha=1.0):
+        if compositor is None:
+            if self._compositor is None:
+                self._compositor = Compositor(surface.get_size())
+            compositor = self._compositor
+        if self.decor:
+            compositor.draw_background(surface, self.background, self.fern_mgr, alpha)
+        else:
+            surface.fill(SKY_COLOR)
+            pygame.draw.rect(surface, GROUND_COLOR, (0, GROUND_TOP, WIDTH, GROUND_H))
+        for o in self.obstacles:
+            o.draw(surface, alpha)
+        self.player.draw(surface, alpha)
+        PROFILER.mark("sprites")
+
+# ---------------------------
+# Реплеи: seed забега + шаги, на которых менялось действие. Формат (little
+# endian): заголовок "<4sBBQIII" (26 байт) — магия, версия, режим
+# столкновений, seed, число шагов, счёт, число записей; затем записи "<IB"
+# (5 байт) — шаг, действие
+# ---------------------------
+REPLAY_MAGIC = b"SPRP"
+REPLAY_VERSION = 1
+REPLAY_HEADER = struct.Struct("<4sBBQIII")
+REPLAY_ENTRY = struct.Struct("<IB")
+REPLAY_COLLISION = ("mask", "hitbox")
+
+class Replay:
+    def __init__(self, seed, collision=None):
+        self.seed = seed
+        self.collision = collision or COLLISION_MODE
+        self.changes = []  # (шаг, действие)
+        self.frames = 0
+        self.score = 0
+        self.last_action = ACTION_NONE
+
+    def record(self, frame, action):
+        # вызывается перед каждым шагом; пишется только смена действия
+        if action != self.last_action:
+            self.changes.append((frame, action))
+            self.last_action = action
+
+    def finish(self, game):
+        self.frames = game.frames
+        self.score = game.score
+
+    def actions(self):
+        # действие на каждый шаг 0..frames-1
+        action = ACTION_NONE
+        changes = iter(self.changes)
+        nxt = next(changes, None)
+        for frame in range(self.frames):
+            while nxt is not None and nxt[0] == frame:
+                action = nxt[1]
+                nxt = next(changes, None)
+            yield action
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, REPLAY_COLLISION.index(self.collision),
+                                       self.seed, self.frames, self.score, len(self.changes)))
+            for frame, action in self.changes:
+                f.write(REPLAY_ENTRY.pack(frame, action))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, collision, seed, frames, score, count = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path}: не реплей Spino Run (или другая версия формата)")
+        replay = cls(seed, REPLAY_COLLISION[collision])
+        replay.frames = frames
+        replay.score = score
+        replay.changes = list(REPLAY_ENTRY.iter_unpack(data[REPLAY_HEADER.size:REPLAY_HEADER.size + count * REPLAY_ENTRY.size]))
+        return replay
+
+def play_replay(path):
+    # пересчёт забега без окна на максимальной скорости; 0 — совпал с записью
+    try:
+        replay = Replay.load(path)
+    except Exception as e:
+        print(f"[!] Не удалось загрузить реплей: {path} ({e})")
+        return 2
+    game = GameState(decor=False, collision=replay.collision)
+    game.reset(replay.seed)
+    t0 = time.perf_counter()
+    for action in replay.actions():
+        game.step(action)
+        if game.done:
+            break
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    ok = (game.frames, game.score) == (replay.frames, replay.score)
+    print(f"реплей {path}: seed {replay.seed}, шагов {game.frames}/{replay.frames}, "
+          f"счёт {game.score}/{replay.score}, дистанция {int(game.distance)}, "
+          f"{game.frames / elapsed:,.0f} шагов/с — {'совпадает' if ok else 'РАСХОЖДЕНИЕ'}")
+    return 0 if ok else 1
+
+# ---------------------------
+# Пакет ассетов: спрайты уже нужного размера, исходники и готовые билборды
+# деревьев (сырые RGBA) и звуки в формате микшера — в одном файле, который
+# читается через mmap без декодирования PNG/WAV и без масштабирования.
+# Формат: "<4sBI" (магия, версия, длина индекса), JSON-индекс, данные.
+# Пакет устаревает, если поменялись исходники (mtime и размер, при
+# расхождении — sha1), параметры сборки или формат микшера
+# ---------------------------
+ASSET_PACK_FILE = "assets.pack"
+ASSET_PACK_MAGIC = b"SPPK"
+ASSET_PACK_VERSION = 1
+ASSET_PACK_HEADER = struct.Struct("<4sBI")
+
+def tree_prewarm_scale():
+    return 1 / max(1, PIXELATE_FACTOR) if NATIVE_LOWRES else 1.0
+
+def asset_sources():
+    paths = [os.path.join(ASSETS_DIR, name) for name in list(SPRITE_SIZES) + list(TREE_FILES)]
+    return paths + list(SOUND_FILES)
+
+def asset_pack_params():
+    # всё, кроме самих исходников, от чего зависит содержимое пакета
+    return {
+        "sprites": sorted([name, w, h] for name, (w, h) in SPRITE_SIZES.items()),
+        "trees": list(TREE_FILES),
+        "tree_scale": tree_prewarm_scale(),
+        "tree_steps": list(TREE_SCALE_STEPS),
+        "tree_base": [TREE_BASE_W, TREE_BASE_H],
+        "mixer": list(pygame.mixer.get_init() or ()),
+    }
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _source_stamp(path, with_hash=True):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, _file_sha1(path) if with_hash else None]
+
+class AssetPack:
+    def __init__(self, index, data):
+        self.index = index
+        self.data = data  # memoryview над mmap; Surface из frombuffer ссылаются прямо на него
+
+    @classmethod
+    def open(cls, path=ASSET_PACK_FILE, params=None):
+        # None — пакета нет, он битый или устарел
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, version, index_len = ASSET_PACK_HEADER.unpack_from(mm)
+            if magic != ASSET_PACK_MAGIC or version != ASSET_PACK_VERSION:
+                return None
+            start = ASSET_PACK_HEADER.size
+            index = json.loads(mm[start:start + index_len].decode("utf-8"))
+        except (struct.error, ValueError) as e:
+            print(f"[!] Пакет ассетов повреждён: {path} ({e})")
+            return None
+        if index.get("params") != (params or asset_pack_params()):
+            return None
+        stamps = index.get("sources", {})
+        fresh = cls._fresh_stamps(stamps)
+        if fresh is None:
+            return None
+        if fresh != stamps:
+            index["sources"] = fresh
+            cls._restamp(path, index, index_len)
+        return cls(index, memoryview(mm)[start + index_len:])
+
+    @staticmethod
+    def _fresh_stamps(stamps):
+        # None — исходники поменялись; иначе штампы с текущими mtime/размером
+        if sorted(stamps) != sorted(asset_sources()):
+            return None
+        fresh = {}
+        for path, stamp in stamps.items():
+            current = _source_stamp(path, with_hash=False)
+            if current is None or stamp is None:
+                if current != stamp:
+                    return None
+                fresh[path] = stamp
+                continue
+            if current[:2] != stamp[:2]:
+                # mtime сдвинулся (checkout, копирование) — решает содержимое
+                if _file_sha1(path) != stamp[2]:
+                    return None
+                current[2] = stamp[2]
+                fresh[path] = current
+            else:
+                fresh[path] = stamp
+        return fresh
+
+    @staticmethod
+    def _restamp(path, index, index_len):
+        # Содержимое исходников то же, сдвинулись только mtime: индекс
+        # переписывается на месте, чтобы следующий запуск не хешировал всё
+        # заново. Данные не двигаются, поэтому индекс должен влезть в
+        # прежнюю длину (JSON допускает пробелы в конце)
+        data = json.dumps(index).encode("utf-8")
+        if len(data) > index_len:
+            return
+        try:
+            with open(path, "r+b") as f:
+                f.seek(ASSET_PACK_HEADER.size)
+                f.write(data.ljust(index_len))
+        except OSError as e:
+            print(f"[!] Не удалось обновить индекс пакета ассетов: {path} ({e})")
+
+    def _blob(self, entry):
+        return self.data[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def image(self, key):
+        entry = self.index["entries"].get(key)
+        if entry is None:
+            return None
+        surf = pygame.image.frombuffer(self._blob(entry), tuple(entry["size"]), "RGBA")
+        if entry.get("convert") and pygame.display.get_init() and pygame.display.get_surface() is not None:
+            surf = surf.convert_alpha()
+        return surf
+
+    def sound(self, key):
+        entry = self.index["entries"].get(key)
+        if entry is None:
+            return None
+        return pygame.mixer.Sound(buffer=self._blob(entry))
+
+    def sprites(self):
+        for name, (w, h) in SPRITE_SIZES.items():
+            yield name, (w, h), self.image(f"sprite:{name}")
+
+    def tree_images(self):
+        return [self.image(f"tree:{i}") for i in range(self.index["tree_count"])]
+
+    def billboards(self):
+        for key, entry in self.index["entries"].items():
+            if key.startswith("billboard:"):
+                idx, w, h = entry["key"]
+                yield idx, w, h, self.image(key)
+
+    @staticmethod
+    def build(path, tree_images, tree_cache, sounds, params=None):
+        # из уже загруженных обычным путём ассетов. params — asset_pack_params(),
+        # снятые вызывающим: в фоновом потоке константы качества могут уже смениться
+        if params is None:
+            params = asset_pack_params()
+        entries = {}
+        blobs = []
+        offset = 0
+
+        def put(name, data, **meta):
+            nonlocal offset
+            entries[name] = dict(meta, offset=offset, length=len(data))
+            blobs.append(data)
+            offset += len(data)
+
+        def put_image(name, surf, convert, **meta):
+            put(name, pygame.image.tobytes(surf, "RGBA"), size=list(surf.get_size()), convert=convert, **meta)
+
+        for name, (w, h) in SPRITE_SIZES.items():
+            put_image(f"sprite:{name}", SPRITES.get(name, (w, h)), True)
+        # исходники деревьев — без convert: нужны только на промахах кеша
+        for i, img in enumerate(tree_images):
+            put_image(f"tree:{i}", img, False)
+        for idx, w, h in tree_cache.prewarm_keys(params["tree_scale"]):
+            put_image(f"billboard:{idx}:{w}x{h}", tree_cache.get(idx, w, h), True, key=[idx, w, h])
+        if pygame.mixer.get_init():
+            for snd_path, snd in sounds.items():
+                if snd is not None:
+                    put(f"sound:{os.path.basename(snd_path)}", snd.get_raw())
+
+        index = {
+            "params": params,
+            "sources": {p: _source_stamp(p) for p in asset_sources()},
+            "tree_count": len(tree_images),
+            "entries": entries,
+        }
+        index_bytes = json.dumps(index).encode("utf-8")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(ASSET_PACK_HEADER.pack(ASSET_PACK_MAGIC, ASSET_PACK_VERSION, len(index_bytes)))
+            f.write(index_bytes)
+            for data in blobs:
+                f.write(data)
+        os.replace(tmp, path)
+
+def load_sound(path):
+    try:
+        return pygame.mixer.Sound(path)
+    except Exception as e:
+        print(f"[!] Не удалось загрузить звук: {path} ({e})")
+        return None
+
+# ---------------------------
+# Звук: каналы микшера зарезервированы по категориям, поэтому частые звуки
+# интерфейса не могут занять канал death.wav. Повтор того же клипа чаще
+# SOUND_MIN_INTERVAL сливается в один запуск (наведение мыши, несколько
+# шагов симуляции за кадр). Клипы уже в формате микшера: из пакета ассетов
+# или сконвертированы при загрузке. Задержка — от чтения ввода до
+# Channel.play, плюс буфер микшера
+# ---------------------------
+SOUND_CHANNELS = {"ui": 2, "gameplay": 3, "critical": 1}
+SOUND_CLIPS = {  # путь -> (категория, громкость)
+    SND_MENU_HOVER: ("ui", 0.35),
+    SND_MENU_CLICK: ("ui", 0.55),
+    SND_JUMP: ("gameplay", 0.8),
+    SND_CHECKPOINT: ("gameplay", 0.6),
+    SND_DEATH: ("critical", 0.9),
+}
+SOUND_MIN_INTERVAL = 0.05  # с
+SOUND_LATENCY_WINDOW = 256
+
+class SoundManager:
+    def __init__(self, sounds, clips=SOUND_CLIPS, channels=SOUND_CHANNELS):
+        self.clips = {}     # путь -> (Sound, категория)
+        self.channels = {}  # категория -> [Channel]
+        self.started = {}   # категория -> [время запуска на каждом канале]
+        self.last_play = {}
+        self.latencies = deque(maxlen=SOUND_LATENCY_WINDOW)  # мс
+        self.played = 0
+        self.coalesced = 0
+        self.stolen = 0
+        mixer = pygame.mixer.get_init()
+        self.buffer_ms = MIXER_SETTINGS[3] * 1000.0 / mixer[0] if mixer else 0.0
+        if not mixer:
+            return
+        # зарезервированные каналы Sound.play() сам не занимает; сверх них
+        # остаются свободные для прочих звуков
+        reserved = sum(channels.values())
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), reserved + 2))
+        pygame.mixer.set_reserved(reserved)
+        first = 0
+        for category, count in channels.items():
+            self.channels[category] = [pygame.mixer.Channel(first + i) for i in range(count)]
+            self.started[category] = [0.0] * count
+            first += count
+        for path, (category, volume) in clips.items():
+            snd = sounds.get(path)
+            if snd is not None:
+                snd.set_volume(volume)
+                self.clips[path] = (snd, category)
+
+    def play(self, path, t_trigger=None):
+        clip = self.clips.get(path)
+        if clip is None:
+            return
+        now = time.perf_counter()
+        last = self.last_play.get(path)
+        if last is not None and now - last < SOUND_MIN_INTERVAL:
+            self.coalesced += 1
+            return
+        snd, category = clip
+        channels = self.channels[category]
+        started = self.started[category]
+        # свободный канал своей категории, иначе перебиваем самый старый звук
+        i = next((k for k, ch in enumerate(channels) if not ch.get_busy()), None)
+        if i is None:
+            i = min(range(len(channels)), key=started.__getitem__)
+            self.stolen += 1
+        channels[i].play(snd)
+        started[i] = now
+        self.last_play[path] = now
+        self.played += 1
+        self.latencies.append((time.perf_counter() - (now if t_trigger is None else t_trigger)) * 1000.0)
+
+    def stats(self):
+        lat = sorted(self.latencies)
+        return {
+            "played": self.played,
+            "coalesced": self.coalesced,
+            "stolen": self.stolen,
+            "latency_ms": sum(lat) / len(lat) if lat else 0.0,
+            "latency_max_ms": lat[-1] if lat else 0.0,
+            "buffer_ms": self.buffer_ms,
+        }
+
+# ---------------------------
+# Загрузчик ассетов: декодирование PNG/WAV, поиск шрифтов и чтение пакета
+# идут на пуле потоков, каждая задача — Future. Главный поток тем временем
+# крутит экран загрузки. Пересборка пакета ассетов идёт в фоне уже во
+# время игры и дожидается завершения в close()
+# ---------------------------
+ASSET_LOADER_WORKERS = 4
+
+class AssetLoader:
+    def __init__(self, workers=ASSET_LOADER_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.futures = []       # всё, чего ждёт экран загрузки
+        self.background = []    # фоновые задачи (сборка пакета)
+
+    def submit(self, fn, *args):
+        future = self.pool.submit(fn, *args)
+        self.futures.append(future)
+        return future
+
+    def progress(self):
+        if not self.futures:
+            return 1.0
+        return sum(f.done() for f in self.futures) / len(self.futures)
+
+    def done(self):
+        return all(f.done() for f in self.futures)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def assets(self, use_pack=True, pack_path=ASSET_PACK_FILE):
+        # Future -> (tree_images, tree_cache, sounds): спрайты попадают в SPRITES.
+        # Параметры пакета снимаются здесь, в главном потоке, до того как
+        # QualityGovernor начнёт менять PIXELATE_FACTOR
+        params = asset_pack_params()
+        pack = AssetPack.open(pack_path, params) if use_pack else None
+        if pack is not None:
+            return self.submit(self._from_pack, pack)
+        # порядок отправки важен: _finish ждёт задачи, отправленные раньше
+        # него, и при очереди FIFO они к этому моменту уже взяты в работу
+        sprites = {name: self.submit(load_image, name, size) for name, size in SPRITE_SIZES.items()}
+        trees = [self.submit(try_load_image, os.path.join(ASSETS_DIR, n)) for n in TREE_FILES]
+        sounds = {path: self.submit(load_sound, path) for path in SOUND_FILES}
+        return self.submit(self._finish, sprites, trees, sounds, use_pack, pack_path, params)
+
+    def _from_pack(self, pack):
+        for name, size, surf in pack.sprites():
+            SPRITES.add(name, size, surf)
+        SPRITES.preload()  # маски
+        tree_images = pack.tree_images()
+        tree_cache = TreeBillboardCache(tree_images)
+        for idx, w, h, surf in pack.billboards():
+            tree_cache.add(idx, w, h, surf)
+        sounds = {}
+        for path in SOUND_FILES:
+            key = f"sound:{os.path.basename(path)}"
+            sounds[path] = pack.sound(key) if key in pack.index["entries"] else None
+        return tree_images, tree_cache, sounds
+
+    def _finish(self, sprites, trees, sounds, use_pack, pack_path, params):
+        for name, future in sprites.items():
+            SPRITES.add(name, SPRITE_SIZES[name], future.result())
+        SPRITES.preload()  # маски
+        tree_images = [img for img in (f.result() for f in trees) if img]
+        if not tree_images:
+            tree_images = load_tree_variants()  # фоллбэк-«ёлка»
+        # общий кеш масштабов на все фоны; прогрев под масштаб холста фона
+        tree_cache = TreeBillboardCache(tree_images)
+        tree_cache.prewarm(params["tree_scale"])
+        sounds = {path: f.result() for path, f in sounds.items()}
+        if use_pack:
+            self.background.append(self.pool.submit(self._build_pack, pack_path, tree_images, tree_cache, sounds, params))
+        return tree_images, tree_cache, sounds
+
+    @staticmethod
+    def _build_pack(pack_path, tree_images, tree_cache, sounds, params):
+        try:
+            AssetPack.build(pack_path, tree_images, tree_cache, sounds, params)
+        except Exception as e:
+            print(f"[!] Не удалось записать пакет ассетов: {pack_path} ({e})")
+
+def load_assets(use_pack=True, pack_path=ASSET_PACK_FILE):
+    # без экрана загрузки: дождаться всего, включая сборку пакета
+    loader = AssetLoader()
+    try:
+        return loader.assets(use_pack, pack_path).result()
+    finally:
+        loader.close()
+
+def run_loading_screen(display, clock, loader):
+    # лёгкий экран: только заливка и примитивы, без шрифтов (они ещё грузятся).
+    # False — окно закрыли во время загрузки
+    t = 0.0
+    bar = pygame.Rect(0, 0, 320, 14)
+    bar.center = (WIDTH // 2, HEIGHT // 2 + 30)
+    while not loader.done():
+        t += clock.tick(FPS or 60) / 1000.0
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+            display.handle_event(event)
+        screen = display.frame
+        screen.fill(SKY_COLOR)
+        pygame.draw.rect(screen, GROUND_COLOR, (0, GROUND_TOP, WIDTH, GROUND_H))
+        # три прыгающие точки
+        for i in range(3):
+            y = HEIGHT // 2 - 10 - abs(math.sin(t * 5.0 + i * 0.7)) * 18
+            pygame.draw.circle(screen, WHITE, (WIDTH // 2 - 30 + i * 30, round(y)), 7)
+        pygame.draw.rect(screen, BLACK, bar, 2)
+        fill = bar.inflate(-6, -6)
+        fill.width = round(fill.width * loader.progress())
+        if fill.width > 0:
+            pygame.draw.rect(screen, WHITE, fill)
+        display.present()
+    return True
+
+# ---------------------------
+# Аргументы командной строки
+# ---------------------------
+def parse_size(text):
+    try:
+        w, h = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается ШИРИНАxВЫСОТА, получено {text!r}")
+    if w <= 0 or h <= 0:
+        raise argparse.ArgumentTypeError(f"размер должен быть положительным: {text!r}")
+    return w, h
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=TITLE)
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help="ограничение частоты кадров (0 — без ограничения; симуляция всё равно идёт с SIM_HZ)")
+    parser.add_argument("--profile-csv", metavar="PATH",
+                        help="писать время стадий каждого кадра в CSV (F3 в игре — оверлей профайлера)")
+    parser.add_argument("--window", type=parse_size, metavar="ШxВ",
+                        help=f"размер окна (по умолчанию {WIDTH}x{HEIGHT}; окно можно растягивать)")
+    parser.add_argument("--fullscreen", action="store_true", help="на весь экран (F11 в игре — переключить)")
+    parser.add_argument("--pixelate", type=int, metavar="N",
+                        help=f"внутреннее разрешение сцены: {WIDTH}/N x {HEIGHT}/N (по умолчанию N={PIXELATE_FACTOR})")
+    parser.add_argument("--quality", choices=("auto",) + QUALITY_NAMES, default="auto",
+                        help="качество графики: auto — подстраивается под --fps, иначе фиксированный пресет")
+    parser.add_argument("--no-asset-pack", action="store_true",
+                        help=f"грузить PNG/WAV напрямую, без {ASSET_PACK_FILE}")
+    parser.add_argument("--record", metavar="PATH",
+                        help="записывать реплей забега (seed + смены действий) в файл")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="пересчитать записанный забег без окна на максимальной скорости и выйти")
+    return parser.parse_args(argv)
 
 # ---------------------------
 # Главная функция
 # ---------------------------
-def main():
+def main(args=None):
+    global PIXELATE_FACTOR
+    if args is None:
+        args = parse_args([])
+    if args.replay:
+        raise SystemExit(play_replay(args.replay))
+
     # Настройка аудио-буфера до init для меньшей задержки
-    pygame.mixer.pre_init(44100, -16, 2, 512)
+    pygame.mixer.pre_init(*MIXER_SETTINGS)
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    if args.pixelate:
+        PIXELATE_FACTOR = max(1, args.pixelate)
+    # Качество графики подстраивается под целевой FPS; --pixelate его фиксирует.
+    # До загрузчика: от PIXELATE_FACTOR зависят билборды пакета ассетов
+    quality = QualityGovernor(args.fps or FPS, None if args.quality == "auto" else args.quality,
+                              pinned=("PIXELATE_FACTOR",) if args.pixelate else ())
+    display = Display(args.window, args.fullscreen)
     pygame.display.set_caption(TITLE)
     clock = pygame.time.Clock()
 
-    # Шрифты
-    font_ui = pygame.font.SysFont("arial", 20)  # счёт/дистанция во время игры — Arial
-    font_big = get_font_artegra(36, bold=False) # UI/кнопки — Artegra Sans
-    font_huge = get_font_artegra(72, bold=True) # Заголовки — Artegra Sans
+    # Ассеты грузятся параллельно, пока крутится экран загрузки:
+    # спрайты, деревья и звуки — из пакета ассетов или с диска
+    loader = AssetLoader()
+    assets = loader.assets(use_pack=not args.no_asset_pack)
+
+    # Шрифты: в пуле только поиск путей, Font создаются ниже, в главном потоке
+    font_ui = loader.submit(resolve_system_font, "arial")  # счёт/дистанция во время игры — Arial
+    font_big = loader.submit(resolve_font_artegra, False)  # UI/кнопки — Artegra Sans
+    font_huge = loader.submit(resolve_font_artegra, True)  # Заголовки — Artegra Sans
+    font_debug = loader.submit(resolve_system_font, "consolas,dejavusansmono,monospace")  # оверлей профайлера
+
+    if not run_loading_screen(display, clock, loader):
+        loader.close()
+        pygame.quit()
+        return
+    tree_images, tree_cache, sounds = assets.result()
+    screen = display.frame  # меняется вместе с раскладкой окна
+    font_ui = open_font(font_ui.result(), 20)
+    font_big = open_font(font_big.result(), 36)
+    font_huge = open_font(font_huge.result(), 72)
+    font_debug = open_font(font_debug.result(), 14)
+
+    if args.profile_csv:
+        PROFILER.open_csv(args.profile_csv)
 
     # Рекорды
-    best_score, best_distance = load_records()
+    records = RecordsStore()
 
-    # Текстуры деревьев
-    tree_images = load_tree_variants()
+    def record_run(died):
+        records.add_run(game.score, int(game.distance), game.frames, game.seed, died)
 
-    # Звуки
-    def load_sound(path):
-        try:
-            return pygame.mixer.Sound(path)
-        except Exception as e:
-            print(f"[!] Не удалось загрузить звук: {path} ({e})")
-            return None
-
-    snd_jump = load_sound(SND_JUMP)
-    snd_checkpoint = load_sound(SND_CHECKPOINT)
-    snd_death = load_sound(SND_DEATH)
-    snd_menu_click = load_sound(SND_MENU_CLICK)
-    snd_menu_hover = load_sound(SND_MENU_HOVER)
-
-    # Настройка громкости (можно подправить)
-    if snd_jump: snd_jump.set_volume(0.8)
-    if snd_checkpoint: snd_checkpoint.set_volume(0.6)
-    if snd_death: snd_death.set_volume(0.9)
-    if snd_menu_click: snd_menu_click.set_volume(0.55)
-    if snd_menu_hover: snd_menu_hover.set_volume(0.35)
+    # Звуки (громкости — в SOUND_CLIPS)
+    sound = SoundManager(sounds)
 
     # Состояния: "menu", "playing", "paused", "countdown", "game_over"
     state = "menu"
     game = None
     resume_timer = 0.0  # для countdown
+    jump_queued = False  # нажатие прыжка, ещё не отданное шагу симуляции
+    replay = None  # запись текущего забега (--record)
+
+    def save_replay():
+        if replay is None:
+            return
+        replay.finish(game)
+        try:
+            replay.save(args.record)
+        except Exception as e:
+            print(f"[!] Не удалось сохранить реплей: {args.record} ({e})")
 
     # Меню — кнопки
     btn_play = Button(pygame.Rect(0, 0, 260, 52), "Играть", font_big, WHITE, (0,0,0,80), (0,0,0,140))
@@ -752,264 +2603,240 @@ def main():
     over_sel = 0
 
     # Фон для неигровых экранов
-    bg_for_menus = Background(tree_images)
+    bg_for_menus = Background(tree_images, tree_cache)
 
-    running_app = True
-    while running_app:
-        dt_ms = clock.tick(FPS)
-        dt = dt_ms / 1000.0
-        events = pygame.event.get()
+    # Буферы кадра и неизменные слои
+    compositor = Compositor()
 
-        for event in events:
-            if event.type == pygame.QUIT:
-                # сохранить рекорды при закрытии
-                if game and state in ("playing", "paused", "countdown"):
-                    if game["score"] > best_score or int(game["distance"]) > best_distance:
-                        best_score = max(best_score, game["score"])
-                        best_distance = max(best_distance, int(game["distance"]))
-                        save_records(best_score, best_distance)
-                running_app = False
-
-        # Обновление по состояниям
-        if state == "menu":
-            bg_for_menus.update()
-
-            # Рендер фона и меню
-            bg_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            bg_for_menus.draw_to_surface(bg_surf)
-            bg_surf = pixelate_surface(bg_surf, PIXELATE_FACTOR)
-            screen.blit(bg_surf, (0, 0))
-
-            # Заголовок: белый с чёрной обводкой
-            draw_outlined_text(
-                screen,
-                "Spino Run",
-                font_huge,
-                center_pos=(WIDTH//2, 90),
-                fg=WHITE,
-                outline_color=BLACK,
-                outline_w=3
-            )
-
-            # позиционируем кнопки
-            btn_play.rect.center = (WIDTH//2, 180)
-            btn_exit.rect.center = (WIDTH//2, 250)
-
-            # навигация
-            menu_sel, menu_act, hover_changed = menu_navigation(menu_buttons, menu_sel, events)
-            if hover_changed and snd_menu_hover:
-                snd_menu_hover.play()
-
-            # отрисовка с выделением
-            for i, b in enumerate(menu_buttons):
-                b.draw(screen, selected=(i == menu_sel))
-
-            # действия
-            if menu_act is not None and snd_menu_click:
-                snd_menu_click.play()
-            if menu_act == 0:  # Играть
-                game = start_new_run(tree_images)
-                state = "playing"
-                pause_sel = 0
-                over_sel = 0
-            elif menu_act == 1:  # Выход
-                running_app = False
-
-        elif state == "playing":
-            keys = pygame.key.get_pressed()
-
-            # Обработка событий клавиатуры для прыжка и паузы
-            for e in events:
-                if e.type == pygame.KEYDOWN:
-                    if e.key in (pygame.K_w, pygame.K_UP, pygame.K_SPACE):
-                        if game["player"].start_jump():
-                            if snd_jump:
-                                snd_jump.play()
-                    elif e.key == pygame.K_ESCAPE:
-                        state = "paused"
-                        pause_sel = 0
-
-            # Обновление игры
-            game["player"].update(keys)
-            game["distance"] += DISTANCE_SPEED * dt
-
-            # Чекпоинты (метки)
-            checkpoint_index = int(game["distance"] // CHECKPOINT_STEP)
-            if checkpoint_index > game["last_checkpoint_index"]:
-                game["last_checkpoint_index"] = checkpoint_index
-                if checkpoint_index > 0 and snd_checkpoint:
-                    snd_checkpoint.play()
-
-            game["background"].update()
-
-            game["spawn_timer"] += 1
-            if game["spawn_timer"] >= game["next_spawn"]:
-                allow_fliers = game["distance"] >= 500.0
-                if allow_fliers and random.random() < 0.4:
-                    game["obstacles"].append(Pteranodon())
-                else:
-                    game["obstacles"].append(Cactus())
-                game["spawn_timer"] = 0
-                game["next_spawn"] = random.randint(55, 100)
-
-            for o in game["obstacles"][:]:
-                o.update()
-                if o.is_offscreen():
-                    game["obstacles"].remove(o)
-                    game["score"] += 1
-
-            game["fern_mgr"].update(dt)
-
-            # Столкновения
-            if any(o.rect.colliderect(game["player"].rect) for o in game["obstacles"]):
-                if snd_death:
-                    snd_death.play()
-                # сохранить рекорды
-                if game["score"] > best_score or int(game["distance"]) > best_distance:
-                    best_score = max(best_score, game["score"])
-                    best_distance = max(best_distance, int(game["distance"]))
-                    save_records(best_score, best_distance)
-                state = "game_over"
-                over_sel = 0
-
-            # Рендер
-            bg_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            game["background"].draw_to_surface(bg_surf)
-            game["fern_mgr"].draw(bg_surf)
-            bg_surf = pixelate_surface(bg_surf, PIXELATE_FACTOR)
-            screen.blit(bg_surf, (0, 0))
-
-            for o in game["obstacles"]:
-                o.draw(screen)
-            game["player"].draw(screen)
-
-            # UI (только счёт и дистанция; без подсказок управления)
-            dist_txt = int(game["distance"])
-            ui1 = font_ui.render(f"Score: {game['score']}   Distance: {dist_txt}", True, BLACK)
-            ui2 = font_ui.render(f"Best Score: {best_score}   Best Distance: {best_distance}", True, BLACK)
-            screen.blit(ui1, (10, 10))
-            screen.blit(ui2, (10, 35))
-
-        elif state == "paused":
-            # Отрисуем текущий кадр сцены (замороженной)
-            if game:
-                bg_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-                game["background"].draw_to_surface(bg_surf)
-                game["fern_mgr"].draw(bg_surf)
-                bg_surf = pixelate_surface(bg_surf, PIXELATE_FACTOR)
-                screen.blit(bg_surf, (0, 0))
-                for o in game["obstacles"]:
-                    o.draw(screen)
-                game["player"].draw(screen)
-
-            # Полупрозрачная плашка
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 120))
-            screen.blit(overlay, (0, 0))
-
-            pause_title_surf = font_huge.render("Пауза", True, WHITE)
-            screen.blit(pause_title_surf, pause_title_surf.get_rect(center=(WIDTH//2, 110)))
-
-            btn_resume.rect.center = (WIDTH//2, 190)
-            btn_to_menu.rect.center = (WIDTH//2, 255)
-
-            # навигация
-            pause_sel, pause_act, hover_changed = menu_navigation(pause_buttons, pause_sel, events)
-            if hover_changed and snd_menu_hover:
-                snd_menu_hover.play()
-
-            # отрисовка с выделением
-            for i, b in enumerate(pause_buttons):
-                b.draw(screen, selected=(i == pause_sel))
-
-            # действия
-            if pause_act is not None and snd_menu_click:
-                snd_menu_click.play()
-            if pause_act == 0:  # Продолжить — запускаем таймер
-                resume_timer = 3.0
-                state = "countdown"
-            elif pause_act == 1:  # Выход в меню
-                if game and (game["score"] > best_score or int(game["distance"]) > best_distance):
-                    best_score = max(best_score, game["score"])
-                    best_distance = max(best_distance, int(game["distance"]))
-                    save_records(best_score, best_distance)
-                state = "menu"
-                game = None
-                menu_sel = 0
-
-        elif state == "countdown":
-            # Кадр сцены (замороженной)
-            if game:
-                bg_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-                game["background"].draw_to_surface(bg_surf)
-                game["fern_mgr"].draw(bg_surf)
-                bg_surf = pixelate_surface(bg_surf, PIXELATE_FACTOR)
-                screen.blit(bg_surf, (0, 0))
-                for o in game["obstacles"]:
-                    o.draw(screen)
-                game["player"].draw(screen)
-
-            # Тёмная плашка + таймер в центре
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 100))
-            screen.blit(overlay, (0, 0))
-
-            resume_timer -= dt
-            num = max(1, int(math.ceil(resume_timer)))
-            timer_surf = font_huge.render(str(num), True, WHITE)
-            screen.blit(timer_surf, timer_surf.get_rect(center=(WIDTH//2, HEIGHT//2)))
-
-            if resume_timer <= 0:
-                state = "playing"
-
-        elif state == "game_over":
-            # Отрисуем последнюю сцену
-            if game:
-                bg_surf = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-                game["background"].draw_to_surface(bg_surf)
-                game["fern_mgr"].draw(bg_surf)
-                bg_surf = pixelate_surface(bg_surf, PIXELATE_FACTOR)
-                screen.blit(bg_surf, (0, 0))
-                for o in game["obstacles"]:
-                    o.draw(screen)
-                game["player"].draw(screen)
-
-            # Тёмная плашка + кнопки
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 140))
-            screen.blit(overlay, (0, 0))
-
-            title = font_huge.render("Game Over", True, WHITE)
-            stats = font_big.render(f"Score: {game['score']}   Distance: {int(game['distance'])}", True, WHITE)
-            screen.blit(title, title.get_rect(center=(WIDTH//2, 110)))
-            screen.blit(stats, stats.get_rect(center=(WIDTH//2, 150)))
-
-            btn_restart.rect.center = (WIDTH//2, 210)
-            btn_go_menu.rect.center = (WIDTH//2, 270)
-
-            # навигация
-            over_sel, over_act, hover_changed = menu_navigation(over_buttons, over_sel, events)
-            if hover_changed and snd_menu_hover:
-                snd_menu_hover.play()
-
-            # отрисовка с выделением
-            for i, b in enumerate(over_buttons):
-                b.draw(screen, selected=(i == over_sel))
-
-            # действия
-            if over_act is not None and snd_menu_click:
-                snd_menu_click.play()
-            if over_act == 0:  # Заново
-                game = start_new_run(tree_images)
-                state = "playing"
-            elif over_act == 1:  # Выход в меню
-                state = "menu"
-                game = None
-                menu_sel = 0
+    # Накопитель времени для фиксированного шага симуляции
+    sim_acc = 0.0
 
-        pygame.display.flip()
-
-    pygame.quit()
+    running_app = True
+    try:
+        while running_app:
+            dt_ms = clock.tick(args.fps)
+            PROFILER.mark("wait")
+            if state in ("menu", "playing"):
+                # на паузе, в отсчёте и после Game Over кадр — готовый снимок: о качестве он не говорит
+                quality.update(clock.get_rawtime())
+            dt = min(dt_ms / 1000.0, MAX_FRAME_DT)
+            events = display.map_events(pygame.event.get())
+            input_time = time.perf_counter()  # от этого момента считается задержка звука
+
+            # Мир (меню или забег) живёт только в "menu" и "playing"; в остальных
+            # состояниях время не копится, чтобы после паузы не было рывка
+            sim_steps = 0
+            if state in ("menu", "playing"):
+                sim_acc += dt
+                while sim_acc >= SIM_DT and sim_steps < MAX_SIM_STEPS:
+                    sim_acc -= SIM_DT
+                    sim_steps += 1
+                if sim_steps == MAX_SIM_STEPS:
+                    sim_acc = min(sim_acc, SIM_DT)
+            sim_alpha = sim_acc / SIM_DT
+            mouse_pos = display.mouse_pos()  # одно чтение на кадр: наведение кнопок и навигация
+
+            for event in events:
+                if event.type == pygame.QUIT:
+                    # недоигранный забег сохраняется после цикла, после последнего шага
+                    running_app = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    PROFILER.toggle_overlay()
+                elif display.handle_event(event):
+                    screen = display.frame
+            PROFILER.mark("events")
+
+            # Обновление по состояниям
+            if state == "menu":
+                for _ in range(sim_steps):
+                    bg_for_menus.update()
+                PROFILER.mark("sim")
+
+                # Рендер фона и меню
+                compositor.draw_background(screen, bg_for_menus, alpha=sim_alpha)
+
+                # Заголовок: белый с чёрной обводкой
+                draw_outlined_text(
+                    screen,
+                    "Spino Run",
+                    font_huge,
+                    center_pos=(WIDTH//2, 90),
+                    fg=WHITE,
+                    outline_color=BLACK,
+                    outline_w=3
+                )
+
+                # позиционируем кнопки
+                btn_play.rect.center = (WIDTH//2, 180)
+                btn_exit.rect.center = (WIDTH//2, 250)
+
+                # навигация
+                menu_sel, menu_act, hover_changed = menu_navigation(menu_buttons, menu_sel, events, mouse_pos)
+                if hover_changed:
+                    sound.play(SND_MENU_HOVER, input_time)
+
+                # отрисовка с выделением
+                for i, b in enumerate(menu_buttons):
+                    b.draw(screen, selected=(i == menu_sel))
+
+                # действия
+                if menu_act is not None:
+                    sound.play(SND_MENU_CLICK, input_time)
+                if menu_act == 0:  # Играть
+                    game = GameState(tree_images, tree_cache)
+                    replay = Replay(game.seed, game.collision) if args.record else None
+                    jump_queued = False
+                    state = "playing"
+                    pause_sel = 0
+                    over_sel = 0
+                elif menu_act == 1:  # Выход
+                    running_app = False
+
+            elif state == "playing":
+                # Прыжок — по нажатию (ждёт ближайшего шага симуляции), пригибание — пока клавиша зажата
+                for e in events:
+                    if e.type == pygame.KEYDOWN:
+                        if e.key in (pygame.K_w, pygame.K_UP, pygame.K_SPACE):
+                            jump_queued = True
+                        elif e.key == pygame.K_ESCAPE:
+                            state = "paused"
+                            pause_sel = 0
+                keys = pygame.key.get_pressed()
+                duck = keys[pygame.K_s] or keys[pygame.K_DOWN] or keys[pygame.K_RCTRL]
+
+                # Обновление игры: столько фиксированных шагов, сколько набежало
+                for _ in range(sim_steps):
+                    if jump_queued:
+                        action = ACTION_JUMP
+                        jump_queued = False
+                    else:
+                        action = ACTION_DUCK if duck else ACTION_NONE
+                    if replay:
+                        replay.record(game.frames, action)
+                    game.step(action)
+                    if "jump" in game.events:
+                        sound.play(SND_JUMP, input_time)
+                    if "checkpoint" in game.events:
+                        sound.play(SND_CHECKPOINT, input_time)
+                    if game.done:
+                        sound.play(SND_DEATH, input_time)
+                        record_run(died=True)
+                        save_replay()
+                        state = "game_over"
+                        over_sel = 0
+                        break
+                PROFILER.mark("sim")
+
+                # Рендер: между прошлым и текущим шагом
+                compositor.draw_world(screen, game, sim_alpha)
+
+                # UI (только счёт и дистанция; без подсказок управления)
+                dist_txt = int(game.distance)
+                TEXT_CACHE.draw_glyphs(screen, font_ui, f"Score: {game.score}   Distance: {dist_txt}", BLACK, (10, 10))
+                TEXT_CACHE.draw_glyphs(screen, font_ui, f"Best Score: {records.best_score}   Best Distance: {records.best_distance}", BLACK, (10, 35))
+
+            elif state == "paused":
+                # Текущий кадр сцены (замороженной) с полупрозрачной плашкой
+                if game:
+                    compositor.draw_frozen(screen, game, 120)
+
+                draw_text(screen, "Пауза", font_huge, (WIDTH//2, 110))
+
+                btn_resume.rect.center = (WIDTH//2, 190)
+                btn_to_menu.rect.center = (WIDTH//2, 255)
+
+                # навигация
+                pause_sel, pause_act, hover_changed = menu_navigation(pause_buttons, pause_sel, events, mouse_pos)
+                if hover_changed:
+                    sound.play(SND_MENU_HOVER, input_time)
+
+                # отрисовка с выделением
+                for i, b in enumerate(pause_buttons):
+                    b.draw(screen, selected=(i == pause_sel))
+
+                # действия
+                if pause_act is not None:
+                    sound.play(SND_MENU_CLICK, input_time)
+                if pause_act == 0:  # Продолжить — запускаем таймер
+                    resume_timer = 3.0
+                    state = "countdown"
+                elif pause_act == 1:  # Выход в меню
+                    if game:
+                        record_run(died=False)
+                    save_replay()
+                    state = "menu"
+                    game = None
+                    menu_sel = 0
+
+            elif state == "countdown":
+                # Кадр сцены (замороженной) с тёмной плашкой + таймер в центре
+                if game:
+                    compositor.draw_frozen(screen, game, 100)
+
+                resume_timer -= dt
+                num = max(1, int(math.ceil(resume_timer)))
+                draw_text(screen, str(num), font_huge, (WIDTH//2, HEIGHT//2))
+
+                if resume_timer <= 0:
+                    state = "playing"
+
+            elif state == "game_over":
+                # Последняя сцена с тёмной плашкой + кнопки
+                if game:
+                    compositor.draw_frozen(screen, game, 140)
+
+                draw_text(screen, "Game Over", font_huge, (WIDTH//2, 110))
+                draw_text(screen, f"Score: {game.score}   Distance: {int(game.distance)}", font_big, (WIDTH//2, 150))
+
+                btn_restart.rect.center = (WIDTH//2, 210)
+                btn_go_menu.rect.center = (WIDTH//2, 270)
+
+                # навигация
+                over_sel, over_act, hover_changed = menu_navigation(over_buttons, over_sel, events, mouse_pos)
+                if hover_changed:
+                    sound.play(SND_MENU_HOVER, input_time)
+
+                # отрисовка с выделением
+                for i, b in enumerate(over_buttons):
+                    b.draw(screen, selected=(i == over_sel))
+
+                # действия
+                if over_act is not None:
+                    sound.play(SND_MENU_CLICK, input_time)
+                if over_act == 0:  # Заново
+                    game.reset()
+                    replay = Replay(game.seed, game.collision) if args.record else None
+                    jump_queued = False
+                    state = "playing"
+                elif over_act == 1:  # Выход в меню
+                    state = "menu"
+                    game = None
+                    menu_sel = 0
+
+            PROFILER.mark("ui")
+            if PROFILER.overlay_visible:
+                snd = sound.stats()
+                PROFILER.draw_overlay(screen, font_debug, (
+                    f"audio {snd['latency_ms']:.2f} ms (max {snd['latency_max_ms']:.2f}) +buf {snd['buffer_ms']:.1f}",
+                    f"played {snd['played']}  merged {snd['coalesced']}  cut {snd['stolen']}",
+                    quality.status(),
+                ))
+            PROFILER.mark("overlay")
+
+            display.present()
+            PROFILER.mark("flip")
+            PROFILER.end_frame(state)
+
+        # недоигранный забег — после последнего шага, а не в обработчике QUIT
+        if game and state in ("playing", "paused", "countdown"):
+            record_run(died=False)
+            save_replay()
+    finally:
+        # и при исключении: дописать рекорды, закрыть CSV профайлера, дождаться пакета
+        records.close()
+        PROFILER.close()
+        loader.close()  # дождаться фоновой сборки пакета ассетов
+        pygame.quit()
 
 if __name__ == "__main__":
-    main()
+    main(parse_args())
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# без окна и звуковой карты; модули игры лежат в корне репозитория
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def screen(monkeypatch):
+    # окно 800x400 на dummy-драйвере; ассеты ищутся относительно корня репозитория
+    import pygame
+    import spino_runner as sr
+    monkeypatch.chdir(ROOT)
+    pygame.init()
+    yield pygame.display.set_mode((sr.WIDTH, sr.HEIGHT))
+    pygame.quit()
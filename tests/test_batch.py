@@ -0,0 +1,18 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from spino_batch import check_against_single
+from spino_rollout import policy_reflex
+
+
+def test_batch_matches_single_game_state():
+    mismatches, _ = check_against_single(list(range(50)))
+    assert mismatches == []
+
+
+def test_batch_matches_single_game_state_with_pteranodons():
+    # reflex выбирает действия по наблюдениям пакета и доживает до птеранодонов
+    mismatches, with_ptera = check_against_single(list(range(20)), max_steps=4000, policy=policy_reflex)
+    assert mismatches == []
+    assert with_ptera > 0
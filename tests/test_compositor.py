@@ -0,0 +1,41 @@
+import random
+
+import spino_runner as sr
+from spino_rollout import policy_reflex
+
+
+def test_steady_state_frames_allocate_nothing(screen):
+    sr.SPRITES = sr.SpriteRegistry()
+    sr.SPRITES.preload()
+    tree_images = sr.load_tree_variants()
+    tree_cache = sr.TreeBillboardCache(tree_images)
+    tree_cache.prewarm(sr.tree_prewarm_scale())
+    game = sr.GameState(tree_images, tree_cache)
+    obs = game.reset(5)
+    rng = random.Random(5)
+    compositor = sr.Compositor()
+
+    def play(frames):
+        nonlocal obs
+        for _ in range(frames):
+            obs, _, _ = game.step(policy_reflex(obs, rng))
+            compositor.draw_world(screen, game, 0.5)
+
+    # прогрев: холст, небо, снимок и обе плашки затемнения создаются один раз
+    play(10)
+    compositor.draw_frozen(screen, game, 100)
+    compositor.draw_frozen(screen, game, 140)
+    allocations = compositor.allocations
+    misses = sr.SPRITES.stats()["misses"]
+
+    play(600)                           # игра: спавн препятствий, новые полосы холмов
+    for alpha in (100, 140):            # пауза / отсчёт, затем Game Over
+        play(30)
+        for _ in range(60):
+            compositor.draw_frozen(screen, game, alpha)
+
+    assert not game.done
+    assert game.score > 0  # препятствия появлялись и уходили
+    assert compositor.allocations == allocations
+    # все спрайты — из реестра, во время игры ничего не декодируется
+    assert sr.SPRITES.stats()["misses"] == misses
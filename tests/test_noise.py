@@ -0,0 +1,19 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import spino_runner as sr
+
+
+@pytest.mark.parametrize("seed", [1, 7, 1337, 4242])
+def test_noise_array_matches_scalar(seed):
+    noise = sr.FractalNoise1D(seed=seed, octaves=4, persistence=0.55, base_freq=1 / 260.0)
+    # мировые колонки вокруг нуля и далеко по ходу забега, как их подаёт HillNoiseLayer
+    wxs = np.concatenate([np.arange(-500, 2500), np.arange(10 ** 6, 10 ** 6 + 1000)]) + 0.25
+    xs = wxs * noise.base_freq
+    batch = noise.noise_array(xs)
+    assert batch.tolist() == [noise.noise(x) for x in xs.tolist()]
+    for octave in range(noise.octaves):
+        scaled = xs * 2.0 ** octave
+        assert (noise.value_noise_array(scaled, octave).tolist()
+                == [noise.value_noise(x, octave) for x in scaled.tolist()])
@@ -0,0 +1,53 @@
+import pytest
+
+import spino_runner as sr
+
+
+@pytest.fixture(autouse=True)
+def restore_quality():
+    # пресеты меняют константы модуля; "high" совпадает с умолчаниями
+    yield
+    sr.QualityGovernor(60, "high")
+
+
+@pytest.mark.parametrize("preset", sr.QUALITY_NAMES)
+def test_fixed_preset(preset):
+    gov = sr.QualityGovernor(60, preset)
+    assert gov.name == preset
+    assert not gov.auto
+    assert gov.changes == 0
+    for name, value in dict(sr.QUALITY_PRESETS)[preset].items():
+        assert getattr(sr, name) == value
+    gov.update(1000.0)  # фиксированный уровень не двигается
+    assert gov.name == preset
+
+
+def test_pinned_constant_is_kept():
+    sr.PIXELATE_FACTOR = 2
+    sr.QualityGovernor(60, "min", pinned=("PIXELATE_FACTOR",))
+    assert sr.PIXELATE_FACTOR == 2
+    assert sr.TREES_ENABLED is False
+
+
+def test_auto_settles_without_flapping():
+    # high/medium не влезают в бюджет 16.7 мс, low — с запасом, но без лишнего
+    cost = {0: 20.0, 1: 18.0, 2: 13.0, 3: 8.0}
+    gov = sr.QualityGovernor(60)
+    for _ in range(20 * sr.QUALITY_RETRY_FRAMES):
+        gov.update(cost[gov.level])
+    assert gov.name == "low"
+    assert gov.changes == 2
+
+
+def test_failed_level_is_retried_with_backoff():
+    # low едва не влезает, min — с большим запасом: повторы low всё реже
+    cost = {0: 20.0, 1: 20.0, 2: 16.0, 3: 5.0}
+    gov = sr.QualityGovernor(60)
+    levels = []
+    for _ in range(10 * sr.QUALITY_RETRY_FRAMES):
+        gov.update(cost[gov.level])
+        levels.append(gov.level)
+    retries = [i for i in range(1, len(levels)) if levels[i] == 2 and levels[i - 1] == 3]
+    gaps = [b - a for a, b in zip(retries, retries[1:])]
+    assert len(retries) >= 3
+    assert all(b > a for a, b in zip(gaps, gaps[1:]))
@@ -0,0 +1,41 @@
+import json
+
+import spino_runner as sr
+
+
+def open_store(tmp_path):
+    return sr.RecordsStore(str(tmp_path / "records.json"), str(tmp_path / "runs.log"),
+                           str(tmp_path / "records.txt"))
+
+
+def test_runs_missing_from_table_are_read_from_log(tmp_path):
+    store = open_store(tmp_path)
+    store.add_run(5, 100, 600, 1)
+    store.add_run(3, 80, 500, 2)
+    store.close()
+    table = (tmp_path / "records.json").read_text(encoding="utf-8")
+    store = open_store(tmp_path)
+    store.add_run(9, 300, 1800, 3)
+    store.close()
+    # сбой между дозаписью журнала и заменой таблицы: таблица отстаёт на забег
+    (tmp_path / "records.json").write_text(table, encoding="utf-8")
+
+    store = open_store(tmp_path)
+    assert store.runs == 3
+    assert (store.best_score, store.best_distance) == (9, 300)
+    assert [r["index"] for r in store.top] == [2, 0, 1]
+    # догнанная таблица сохранена сразу
+    assert json.loads((tmp_path / "records.json").read_text(encoding="utf-8"))["runs"] == 3
+
+
+def test_damaged_table_does_not_leak_into_rebuild(tmp_path):
+    store = open_store(tmp_path)
+    store.add_run(5, 100, 600, 1)
+    store.close()
+    # поля до "top" разбираются, но чужие значения не должны попасть в пересборку
+    (tmp_path / "records.json").write_text(
+        json.dumps({"best_score": 999, "best_distance": 999, "runs": 40, "top": None}), encoding="utf-8")
+
+    store = open_store(tmp_path)
+    assert (store.best_score, store.best_distance, store.runs) == (5, 100, 1)
+    assert [r["index"] for r in store.top] == [0]
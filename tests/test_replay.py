@@ -0,0 +1,33 @@
+import spino_runner as sr
+
+
+def script(frame):
+    # фиксированный ввод: прыжок, пауза, приседание, пауза — по кругу
+    phase = frame % 41
+    if phase < 10:
+        return sr.ACTION_JUMP
+    if 20 <= phase < 28:
+        return sr.ACTION_DUCK
+    return sr.ACTION_NONE
+
+
+def test_recorded_decor_run_replays_headless(screen, tmp_path):
+    # запись идёт с деревьями и холмами, проигрыш — без декора: decor_rng
+    # не должен влиять на препятствия
+    tree_images = sr.load_tree_variants()
+    game = sr.GameState(tree_images, sr.TreeBillboardCache(tree_images))
+    game.reset(11)
+    replay = sr.Replay(game.seed, game.collision)
+    while not game.done and game.frames < 3000:
+        action = script(game.frames)
+        replay.record(game.frames, action)
+        game.step(action)
+    replay.finish(game)
+    assert game.done and game.score > 0  # пара препятствий пройдена, забег закончен столкновением
+
+    path = str(tmp_path / "run.sprr")
+    replay.save(path)
+    loaded = sr.Replay.load(path)
+    assert (loaded.seed, loaded.collision, loaded.frames, loaded.score, loaded.changes) == (
+        replay.seed, replay.collision, replay.frames, replay.score, replay.changes)
+    assert sr.play_replay(path) == 0